@@ -1,33 +1,261 @@
 from abc import ABC
-from typing import List, Dict
-from collections import deque
+from typing import List, Dict, Optional, Tuple, Iterator
+from collections import OrderedDict
+from concurrent.futures import Executor
+from contextlib import ExitStack, nullcontext
+import asyncio
+import bisect
 import datetime
+import itertools
+import json
+import os
+import threading
+
+
+# Helper to turn "HH:MM" into minutes since midnight without strptime/strftime
+def minute_of_day(hh_mm: str) -> int:
+    hours, minutes = hh_mm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def format_minute(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+OPENING_MINUTE = 9 * 60
+CLOSING_MINUTE = 21 * 60
+SLOT_MINUTES = 30
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_NEARBY_RADIUS = 10.0
+# Side of a clinic grid cell; a default-radius query reads at most a 3 x 3 block of cells
+CLINIC_CELL_SIZE = DEFAULT_NEARBY_RADIUS
+
+
+# Slot starts are absolute minutes: date.toordinal() * MINUTES_PER_DAY + minute of day.
+# Undated slots live on day 0, so single-day callers keep using plain "HH:MM" times.
+def day_of(date: Optional[str]) -> int:
+    return datetime.date.fromisoformat(date).toordinal() if date else 0
+
+
+def parse_start(start_time: str) -> int:
+    # "HH:MM" or "YYYY-MM-DD HH:MM" -> absolute start minute
+    date, _, hh_mm = start_time.rpartition(" ")
+    return day_of(date) * MINUTES_PER_DAY + minute_of_day(hh_mm)
+
+
+def format_start(start_minute: int) -> str:
+    day, minute = divmod(start_minute, MINUTES_PER_DAY)
+    if day == 0:
+        return format_minute(minute)
+    return f"{datetime.date.fromordinal(day).isoformat()} {format_minute(minute)}"
+
+
+def slot_in_business_hours(start_minute: int) -> bool:
+    # The one rule for accepting a slot: it starts and ends within [OPENING_MINUTE, CLOSING_MINUTE]
+    minute = start_minute % MINUTES_PER_DAY
+    return OPENING_MINUTE <= minute and minute + SLOT_MINUTES <= CLOSING_MINUTE
+
+
+# Calendar bitmask helpers, bit i stands for the slot starting at OPENING_MINUTE + i
+def minute_bit(minute: int) -> int:
+    return 1 << (minute - OPENING_MINUTE)
+
+
+def window_mask(from_minute: int, to_minute: int) -> int:
+    # Bits for every slot start in [from_minute, to_minute) within business hours
+    from_minute = max(from_minute, OPENING_MINUTE)
+    to_minute = min(to_minute, CLOSING_MINUTE)
+    if to_minute <= from_minute:
+        return 0
+    return ((1 << (to_minute - from_minute)) - 1) << (from_minute - OPENING_MINUTE)
+
+
+def mask_to_minutes(mask: int) -> List[int]:
+    # Minutes of day of the set bits, in ascending order
+    minutes = []
+    while mask:
+        lowest = mask & -mask
+        minutes.append(OPENING_MINUTE + lowest.bit_length() - 1)
+        mask ^= lowest
+    return minutes
+
+
+# Per-day calendars are dicts of day -> bitmask, these address them by absolute start minute
+def calendar_set(masks: Dict[int, int], start_minute: int):
+    day, minute = divmod(start_minute, MINUTES_PER_DAY)
+    masks[day] = masks.get(day, 0) | minute_bit(minute)
+
+
+def calendar_clear(masks: Dict[int, int], start_minute: int):
+    day, minute = divmod(start_minute, MINUTES_PER_DAY)
+    mask = masks.get(day, 0) & ~minute_bit(minute)
+    if mask:
+        masks[day] = mask
+    else:
+        masks.pop(day, None)
+
+
+def calendar_test(masks: Dict[int, int], start_minute: int) -> bool:
+    day, minute = divmod(start_minute, MINUTES_PER_DAY)
+    return minute >= OPENING_MINUTE and masks.get(day, 0) >> (minute - OPENING_MINUTE) & 1 == 1
 
 
 # Helper class to store time slot
 class TimeSlot:
-    def __init__(self, start_time: str, end_time: str):
-        self.start_time = datetime.datetime.strptime(start_time, "%H:%M")
-        self.end_time = datetime.datetime.strptime(end_time, "%H:%M")
+    def __init__(self, start_time: str, end_time: str, date: Optional[str] = None):
+        self._set_times(datetime.datetime.strptime(start_time, "%H:%M"), datetime.datetime.strptime(end_time, "%H:%M"),
+                        day_of(date))
+
+    def _set_times(self, start_time: datetime.datetime, end_time: datetime.datetime, day: int = 0):
+        self.start_time = start_time
+        self.end_time = end_time
+        self.day = day
+        # Absolute minute keys used by the per-doctor calendars and indexes
+        self.start_minute = day * MINUTES_PER_DAY + self.start_time.hour * 60 + self.start_time.minute
+        self.end_minute = day * MINUTES_PER_DAY + self.end_time.hour * 60 + self.end_time.minute
+        self._label = f"{format_start(self.start_minute)}-{format_minute(self.end_minute % MINUTES_PER_DAY)}"
 
     def duration_valid(self) -> bool:
         return (self.end_time - self.start_time).seconds == 30 * 60  # 30 minutes
 
-    def within_business_hours(self) -> bool:
-        return self.start_time.hour >= 9 and self.end_time.hour <= 21
-
     def __str__(self):
-        return f"{self.start_time.strftime('%H:%M')}-{self.end_time.strftime('%H:%M')}"
+        return self._label
+
+    @staticmethod
+    def parse(slot: str) -> 'TimeSlot':
+        # "HH:MM-HH:MM" or "YYYY-MM-DD HH:MM-HH:MM"
+        date, _, times = slot.rpartition(" ")
+        start, end = times.split("-")
+        return TimeSlot(start, end, date or None)
+
+    @staticmethod
+    def from_minutes(start_minute: int, end_minute: int) -> 'TimeSlot':
+        # Shared read-only slot for the API edge, built without strptime
+        # (same 1900-01-01 base date strptime uses)
+        slot = _slot_cache.get((start_minute, end_minute))
+        if slot is None:
+            day, start = divmod(start_minute, MINUTES_PER_DAY)
+            end = end_minute - day * MINUTES_PER_DAY
+            slot = TimeSlot.__new__(TimeSlot)
+            slot._set_times(datetime.datetime(1900, 1, 1, start // 60, start % 60),
+                            datetime.datetime(1900, 1, 1, end // 60, end % 60), day)
+            slot = _slot_cache.setdefault((start_minute, end_minute), slot)
+        return slot
+
+
+_slot_cache = {}  # (start minute, end minute) -> TimeSlot
+
+
+def format_free_slot(start_minute: int, doctor_name: str) -> str:
+    return f"{doctor_name}: {TimeSlot.from_minutes(start_minute, start_minute + SLOT_MINUTES)}"
+
+
+# Clinic with a location on a flat city grid
+class Clinic:
+    def __init__(self, name: str, x: float, y: float):
+        self._name = name
+        self._x = x
+        self._y = y
+
+    def get_name(self) -> str:
+        return self._name
+
+    def get_location(self) -> Tuple[float, float]:
+        return self._x, self._y
+
+    def get_cell(self) -> Tuple[int, int]:
+        return int(self._x // CLINIC_CELL_SIZE), int(self._y // CLINIC_CELL_SIZE)
+
+    def distance_to(self, other: 'Clinic') -> float:
+        return ((self._x - other._x) ** 2 + (self._y - other._y) ** 2) ** 0.5
+
+
+# FIFO waitlist for a single doctor slot
+class Waitlist:
+    def __init__(self):
+        self._entries = OrderedDict()  # Booking ID -> (Patient, sequence number), in arrival order
+        # Fenwick tree over sequence numbers (1-based) holding 1 for every live entry,
+        # so the position of a booking is a prefix sum instead of a walk
+        self._tree = [0]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, booking_id: int) -> bool:
+        return booking_id in self._entries
+
+    def _update(self, index: int, delta: int):
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def _prefix_sum(self, index: int) -> int:
+        total = 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def append(self, patient: 'Patient', booking_id: int):
+        # Grow the tree by one node: it covers (index - lowbit(index), index]
+        index = len(self._tree)
+        self._tree.append(1 + self._prefix_sum(index - 1) - self._prefix_sum(index - (index & -index)))
+        self._entries[booking_id] = (patient, index)
+
+    def entries(self) -> List[Tuple['Patient', int]]:
+        # (patient, booking_id) pairs in waitlist order
+        return [(patient, booking_id) for booking_id, (patient, _) in self._entries.items()]
+
+    def peek(self):
+        # Return (patient, booking_id) at the head of the waitlist
+        if not self._entries:
+            return None
+        booking_id, (patient, _) = next(iter(self._entries.items()))
+        return patient, booking_id
+
+    def pop(self):
+        # Remove and return (patient, booking_id) at the head of the waitlist
+        if not self._entries:
+            return None
+        booking_id, (patient, index) = self._entries.popitem(last=False)
+        self._discard(index)
+        return patient, booking_id
+
+    def remove(self, booking_id: int) -> bool:
+        entry = self._entries.pop(booking_id, None)
+        if entry is None:
+            return False
+        self._discard(entry[1])
+        return True
+
+    def _discard(self, index: int):
+        if self._entries:
+            self._update(index, -1)
+        else:
+            # Drop the tree once the waitlist drains so it does not grow forever
+            self._tree = [0]
+
+    def position(self, booking_id: int) -> Optional[int]:
+        # 1-based position of the booking in the waitlist
+        entry = self._entries.get(booking_id)
+        if entry is None:
+            return None
+        return self._prefix_sum(entry[1])
 
 
 # Doctor class
 class Doctor:
-    def __init__(self, name: str, specialty: str):
+    def __init__(self, name: str, specialty: str, clinic: Optional[str] = None):
         self._name = name
         self._specialty = specialty
-        self._appointments = {}  # Booking ID -> Slot
-        self._waitlist = {}  # Slot -> List of Patients waiting for that slot
-        self._available_slots = []  # Available time slots
+        self._clinic = clinic
+        self._appointments = {}  # Booking ID -> start minute
+        self._waitlist = {}  # Start minute -> Waitlist of patients waiting for that slot
+        # Day -> calendar bitmask, bit i is the slot starting i minutes after business hours open
+        self._available_masks = {}
+        self._booked_masks = {}
+        self._waitlisted_masks = {}
+        self._booked_slots = {}  # Start minute -> Booking ID holding that slot
 
     def get_name(self) -> str:
         return self._name
@@ -35,139 +263,748 @@ class Doctor:
     def get_specialty(self) -> str:
         return self._specialty
 
-    def get_available_slots(self) -> List['TimeSlot']:
-        return self._available_slots
-
-    def add_slot(self, slot: TimeSlot):
-        # Add a slot to available slots
-        self._available_slots.append(slot)
+    def get_clinic(self) -> Optional[str]:
+        return self._clinic
 
-    def remove_slot(self, slot: TimeSlot):
-        # Remove a slot from available slots (after booking or cancellation)
-        self._available_slots.remove(slot)
-
-    def add_appointment(self, booking_id: str, slot: TimeSlot):
+    def get_available_slots(self) -> List['TimeSlot']:
+        slots = []
+        for day in sorted(self._available_masks):
+            for minute in mask_to_minutes(self._available_masks[day]):
+                start_minute = day * MINUTES_PER_DAY + minute
+                slots.append(TimeSlot.from_minutes(start_minute, start_minute + SLOT_MINUTES))
+        return slots
+
+    def get_available_mask(self, day: int = 0) -> int:
+        return self._available_masks.get(day, 0)
+
+    def get_free_mask(self, day: int = 0) -> int:
+        # Slots offered and not yet booked
+        return self._available_masks.get(day, 0) & ~self._booked_masks.get(day, 0)
+
+    def get_waitlisted_mask(self, day: int = 0) -> int:
+        return self._waitlisted_masks.get(day, 0)
+
+    def get_free_starts(self) -> List[int]:
+        # Absolute start minutes of every free slot, in order
+        starts = []
+        for day in sorted(self._available_masks):
+            starts.extend(day * MINUTES_PER_DAY + minute for minute in mask_to_minutes(self.get_free_mask(day)))
+        return starts
+
+    def has_slot(self, start_minute: int) -> bool:
+        return calendar_test(self._available_masks, start_minute)
+
+    def get_slot(self, start_minute: int) -> Optional['TimeSlot']:
+        # Look up an available slot by its start minute
+        if not self.has_slot(start_minute):
+            return None
+        return TimeSlot.from_minutes(start_minute, start_minute + SLOT_MINUTES)
+
+    def add_slot(self, start_minute: int):
+        calendar_set(self._available_masks, start_minute)
+
+    def add_slots(self, start_minutes: List[int]):
+        # Build one mask per day and OR it in, instead of one update per slot
+        day_masks = {}
+        for start_minute in start_minutes:
+            day, minute = divmod(start_minute, MINUTES_PER_DAY)
+            day_masks[day] = day_masks.get(day, 0) | minute_bit(minute)
+        for day, mask in day_masks.items():
+            self._available_masks[day] = self._available_masks.get(day, 0) | mask
+
+    def remove_slot(self, start_minute: int):
+        # Remove a slot from available slots
+        calendar_clear(self._available_masks, start_minute)
+
+    def add_appointment(self, booking_id: int, start_minute: int):
         # Add an appointment to the doctor’s record
-        self._appointments[booking_id] = slot
+        self._appointments[booking_id] = start_minute
+        self._booked_slots[start_minute] = booking_id
+        calendar_set(self._booked_masks, start_minute)
+
+    def remove_appointment(self, booking_id: int) -> bool:
+        # Remove the appointment from the doctor's record, returns True if it was holding its slot
+        start_minute = self._appointments.pop(booking_id, None)
+        if start_minute is not None and self._booked_slots.get(start_minute) == booking_id:
+            del self._booked_slots[start_minute]
+            calendar_clear(self._booked_masks, start_minute)
+            return True
+        return False
 
-    def remove_appointment(self, booking_id: str):
-        # Remove the appointment from the doctor's record
-        if booking_id in self._appointments:
-            del self._appointments[booking_id]
+    def get_appointments(self) -> Dict[int, int]:
+        # Booking ID -> start minute
+        return dict(self._appointments)
 
     def is_slot_booked(self, start_time: str) -> bool:
         # Check if the slot is booked by any patient
-        for slot in self._appointments.values():
-            if slot.start_time.strftime("%H:%M") == start_time:
-                return True
-        return False
+        return self.is_minute_booked(parse_start(start_time))
 
-    def add_to_waitlist(self, slot: TimeSlot, patient_name: 'Patient', booking_id: int):
-        if slot not in self._waitlist:
-            self._waitlist[slot] = deque()
-        self._waitlist[slot].append((patient_name, booking_id))
+    def is_minute_booked(self, start_minute: int) -> bool:
+        return calendar_test(self._booked_masks, start_minute)
 
-    def has_waitlist_for_slot(self, slot: TimeSlot) -> bool:
-        # Check if there are any patients on the waitlist for this slot
-        return slot in self._waitlist and len(self._waitlist[slot]) > 0
+    def add_to_waitlist(self, start_minute: int, patient: 'Patient', booking_id: int):
+        if start_minute not in self._waitlist:
+            self._waitlist[start_minute] = Waitlist()
+        self._waitlist[start_minute].append(patient, booking_id)
+        calendar_set(self._waitlisted_masks, start_minute)
 
-    def get_first_waitlist_patient_for_slot(self, slot: TimeSlot):
-        # Return the first patient from the waitlist for a particular slot
-        if slot in self._waitlist and len(self._waitlist[slot]) > 0:
-            return self._waitlist[slot][0]
-        return None
+    def _drop_waitlist_if_empty(self, start_minute: int):
+        if len(self._waitlist[start_minute]) == 0:
+            del self._waitlist[start_minute]
+            calendar_clear(self._waitlisted_masks, start_minute)
+
+    def get_waitlist(self, start_minute: int) -> Optional[Waitlist]:
+        return self._waitlist.get(start_minute)
 
-    def remove_from_waitlist(self, slot: TimeSlot, patient_name: 'Patient', booking_id: int):
-        # Remove a patient from the waitlist for a particular slot
-        if slot in self._waitlist and patient_name in self._waitlist[slot]:
-            self._waitlist[slot].remove((patient_name, booking_id))
+    def has_waitlist_for_slot(self, start_minute: int) -> bool:
+        # Check if there are any patients on the waitlist for this slot
+        return calendar_test(self._waitlisted_masks, start_minute)
+
+    def get_first_waitlist_patient_for_slot(self, start_minute: int):
+        # Return (patient, booking_id) at the head of the waitlist for a particular slot
+        waitlist = self._waitlist.get(start_minute)
+        return waitlist.peek() if waitlist else None
+
+    def pop_waitlist_for_slot(self, start_minute: int):
+        # Remove and return (patient, booking_id) at the head of the waitlist for a particular slot
+        waitlist = self._waitlist.get(start_minute)
+        if not waitlist:
+            return None
+        entry = waitlist.pop()
+        self._drop_waitlist_if_empty(start_minute)
+        return entry
+
+    def remove_from_waitlist(self, start_minute: int, booking_id: int) -> bool:
+        # Remove a booking from the waitlist for a particular slot
+        waitlist = self._waitlist.get(start_minute)
+        if waitlist is None or not waitlist.remove(booking_id):
+            return False
+        self._drop_waitlist_if_empty(start_minute)
+        return True
+
+    def get_waitlist_position(self, start_minute: int, booking_id: int) -> Optional[int]:
+        waitlist = self._waitlist.get(start_minute)
+        return waitlist.position(booking_id) if waitlist else None
+
+    def to_snapshot(self) -> list:
+        # [name, specialty, clinic, [[day, available mask]...], [[booking_id, start]...], [[start, [booking_id...]]...]]
+        return [
+            self._name,
+            self._specialty,
+            self._clinic,
+            [[day, mask] for day, mask in self._available_masks.items()],
+            [[booking_id, start_minute] for booking_id, start_minute in self._appointments.items()],
+            [[minute, [booking_id for _, booking_id in waitlist.entries()]]
+             for minute, waitlist in self._waitlist.items()],
+        ]
+
+
+# Versions for cached patient views. next() on a count is atomic, so concurrent writers
+# touching the same patient from different doctor locks never hand out the same version
+_view_versions = itertools.count()
+
+
+# Appointment record held in a patient's view
+class Appointment:
+    def __init__(self, booking_id: int, doctor_name: str, start_minute: int):
+        self.booking_id = booking_id
+        self.doctor_name = doctor_name
+        self.start_minute = start_minute
+
+    def get_slot(self) -> TimeSlot:
+        return TimeSlot.from_minutes(self.start_minute, self.start_minute + SLOT_MINUTES)
 
+    def __str__(self):
+        return f"booking id: {self.booking_id}, doctor: {self.doctor_name}, slot: {self.get_slot()}"
 
 
-# Patient class
+# Patient class. Appointments are kept as a materialized view that booking, cancellation
+# and waitlist promotion update in place, so reads never go back to the repository.
 class Patient:
     def __init__(self, name: str):
         self.name = name
-        self.appointments = {}
+        self.appointments = {}  # Booking ID -> Appointment
+        self._version = next(_view_versions)
+        self._formatted = None  # (version, text) of the last formatted view
 
-    def add_appointment(self, booking_id: int, slot: TimeSlot):
-        self.appointments[booking_id] = slot
+    def add_appointment(self, booking_id: int, start_minute: int, doctor_name: str):
+        self.appointments[booking_id] = Appointment(booking_id, doctor_name, start_minute)
+        self._version = next(_view_versions)
 
     def remove_appointment(self, booking_id: int):
-        if booking_id in self.appointments:
-            del self.appointments[booking_id]
+        if self.appointments.pop(booking_id, None) is not None:
+            self._version = next(_view_versions)
+
+    def get_appointments(self) -> List[Appointment]:
+        return list(self.appointments.values())
+
+    def format_appointments(self) -> str:
+        # The version is read before the records, so a write that lands while formatting
+        # leaves a stale version behind and the next read rebuilds
+        version = self._version
+        formatted = self._formatted
+        if formatted is not None and formatted[0] == version:
+            return formatted[1]
+        text = "\n".join(str(appointment) for appointment in self.get_appointments()) or "No appointments."
+        self._formatted = (version, text)
+        return text
 
     def get_name(self):
         return self.name
 
 
+# Free slots ordered by (start minute, doctor name). Entries are bucketed per start minute,
+# so updates only touch one small bucket and range lookups bisect the distinct starts.
+class FreeSlotIndex:
+    def __init__(self):
+        self._starts = []  # Sorted start minutes that have at least one free doctor
+        self._doctors = {}  # Start minute -> sorted list of doctor names
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, start_minute: int, doctor_name: str):
+        names = self._doctors.get(start_minute)
+        if names is None:
+            bisect.insort(self._starts, start_minute)
+            self._doctors[start_minute] = [doctor_name]
+        else:
+            index = bisect.bisect_left(names, doctor_name)
+            if index < len(names) and names[index] == doctor_name:
+                return
+            names.insert(index, doctor_name)
+        self._size += 1
+
+    def remove(self, start_minute: int, doctor_name: str):
+        names = self._doctors.get(start_minute)
+        if not names:
+            return
+        index = bisect.bisect_left(names, doctor_name)
+        if index == len(names) or names[index] != doctor_name:
+            return
+        del names[index]
+        self._size -= 1
+        if not names:
+            del self._doctors[start_minute]
+            del self._starts[bisect.bisect_left(self._starts, start_minute)]
+
+    def first(self, from_minute: Optional[int] = None, to_minute: Optional[int] = None) -> Optional[Tuple[int, str]]:
+        # Earliest entry starting in [from_minute, to_minute)
+        index = 0 if from_minute is None else bisect.bisect_left(self._starts, from_minute)
+        if index == len(self._starts):
+            return None
+        start_minute = self._starts[index]
+        if to_minute is not None and start_minute >= to_minute:
+            return None
+        return start_minute, self._doctors[start_minute][0]
+
+    def page(self, offset: int = 0, limit: Optional[int] = None,
+             from_minute: Optional[int] = None) -> List[Tuple[int, str]]:
+        entries = []
+        index = 0 if from_minute is None else bisect.bisect_left(self._starts, from_minute)
+        while index < len(self._starts) and (limit is None or len(entries) < limit):
+            start_minute = self._starts[index]
+            names = self._doctors[start_minute]
+            index += 1
+            if offset >= len(names):
+                offset -= len(names)
+                continue
+            end = len(names) if limit is None else offset + limit - len(entries)
+            entries.extend((start_minute, name) for name in names[offset:end])
+            offset = 0
+        return entries
+
+
+def _last_name(chunk: Tuple[str, ...]) -> str:
+    return chunk[-1]
+
+
+class ConcurrentFreeSlotIndex(FreeSlotIndex):
+    # FreeSlotIndex for concurrent repositories, read without the writers' lock. A bucket is an
+    # immutable (count, chunks) pair, chunks being sorted tuples of at most 2 * CHUNK_SIZE names,
+    # so a write copies one chunk and the tuple of chunks instead of every doctor free at that
+    # minute. Writers publish a new bucket, or a new start list, with a single store.
+    CHUNK_SIZE = 64
+
+    def add(self, start_minute: int, doctor_name: str):
+        bucket = self._doctors.get(start_minute)
+        if bucket is None:
+            # Publish the bucket before the start minute so readers never see a start without one
+            starts = self._starts[:]
+            bisect.insort(starts, start_minute)
+            self._doctors[start_minute] = (1, ((doctor_name,),))
+            self._starts = starts
+            self._size += 1
+            return
+        count, chunks = bucket
+        index = min(bisect.bisect_left(chunks, doctor_name, key=_last_name), len(chunks) - 1)
+        chunk = chunks[index]
+        position = bisect.bisect_left(chunk, doctor_name)
+        if position < len(chunk) and chunk[position] == doctor_name:
+            return
+        chunk = chunk[:position] + (doctor_name,) + chunk[position:]
+        if len(chunk) > 2 * self.CHUNK_SIZE:
+            half = len(chunk) // 2
+            replacement = (chunk[:half], chunk[half:])
+        else:
+            replacement = (chunk,)
+        self._doctors[start_minute] = (count + 1, chunks[:index] + replacement + chunks[index + 1:])
+        self._size += 1
+
+    def remove(self, start_minute: int, doctor_name: str):
+        bucket = self._doctors.get(start_minute)
+        if bucket is None:
+            return
+        count, chunks = bucket
+        index = bisect.bisect_left(chunks, doctor_name, key=_last_name)
+        if index == len(chunks):
+            return
+        chunk = chunks[index]
+        position = bisect.bisect_left(chunk, doctor_name)
+        if chunk[position] != doctor_name:
+            return
+        self._size -= 1
+        if count == 1:
+            starts = self._starts[:]
+            del starts[bisect.bisect_left(starts, start_minute)]
+            self._starts = starts
+            del self._doctors[start_minute]
+            return
+        chunk = chunk[:position] + chunk[position + 1:]
+        self._doctors[start_minute] = (count - 1, chunks[:index] + ((chunk,) if chunk else ()) + chunks[index + 1:])
+
+    def first(self, from_minute: Optional[int] = None, to_minute: Optional[int] = None) -> Optional[Tuple[int, str]]:
+        starts, doctors = self._starts, self._doctors
+        index = 0 if from_minute is None else bisect.bisect_left(starts, from_minute)
+        while index < len(starts):
+            start_minute = starts[index]
+            if to_minute is not None and start_minute >= to_minute:
+                return None
+            bucket = doctors.get(start_minute)
+            # A reader can hold a start list whose bucket was emptied since
+            if bucket is not None:
+                return start_minute, bucket[1][0][0]
+            index += 1
+        return None
+
+    def page(self, offset: int = 0, limit: Optional[int] = None,
+             from_minute: Optional[int] = None) -> List[Tuple[int, str]]:
+        entries = []
+        starts, doctors = self._starts, self._doctors
+        index = 0 if from_minute is None else bisect.bisect_left(starts, from_minute)
+        while index < len(starts) and (limit is None or len(entries) < limit):
+            start_minute = starts[index]
+            bucket = doctors.get(start_minute)
+            index += 1
+            if bucket is None:
+                continue
+            if offset >= bucket[0]:
+                offset -= bucket[0]
+                continue
+            for chunk in bucket[1]:
+                if offset >= len(chunk):
+                    offset -= len(chunk)
+                    continue
+                end = len(chunk) if limit is None else offset + limit - len(entries)
+                entries.extend((start_minute, name) for name in chunk[offset:end])
+                offset = 0
+                if limit is not None and len(entries) == limit:
+                    break
+        return entries
+
+
 # Repository to store data in memory
 class InMemoryRepository:
-    def __init__(self):
+    def __init__(self, thread_safe: bool = False):
+        self._thread_safe = thread_safe
         self._doctors = {}
         self._patients = {}
         self._bookings = {}
         self._waitlists = {}
+        self._clinics = {}
+        self._clinic_cells = {}  # (cell x, cell y) -> {clinic name: Clinic}, see Clinic.get_cell
+        self._free_slots_by_specialty = {}  # Specialty -> FreeSlotIndex
+        self._free_slots_by_clinic = {}  # (Specialty, clinic name) -> FreeSlotIndex
+        self._doctors_by_specialty = {}  # Specialty -> {doctor name: Doctor}
+        self._doctor_locks = {}  # Doctor name -> lock guarding that doctor's slots, bookings and waitlists
+        self._next_booking_id = 1
+        self._booking_id_lock = self._new_lock()
+        self._index_lock = self._new_lock()  # Serializes free-slot index writers only
+
+    def _new_lock(self):
+        # Real locks only in concurrent mode; single-threaded callers skip the locking cost
+        return threading.Lock() if self._thread_safe else nullcontext()
+
+    def _new_free_slot_index(self) -> FreeSlotIndex:
+        # Concurrent indexes are read without _index_lock, see ConcurrentFreeSlotIndex
+        return ConcurrentFreeSlotIndex() if self._thread_safe else FreeSlotIndex()
 
     def add_doctor(self, doctor: Doctor):
+        self._doctor_locks.setdefault(doctor.get_name(), self._new_lock())
+        previous = self._doctors.get(doctor.get_name())
+        if previous:
+            self._doctors_by_specialty[previous.get_specialty()].pop(previous.get_name(), None)
+            # The replaced doctor's free slots must not stay listed under its specialty or clinic
+            self.remove_free_slots([(previous, start_minute) for start_minute in previous.get_free_starts()])
         self._doctors[doctor.get_name()] = doctor
+        self._doctors_by_specialty.setdefault(doctor.get_specialty(), {})[doctor.get_name()] = doctor
 
     def get_doctor(self, name: str) -> Doctor:
         return self._doctors.get(name)
 
+    def add_clinic(self, clinic: Clinic):
+        previous = self._clinics.get(clinic.get_name())
+        if previous:
+            cell = self._clinic_cells[previous.get_cell()]
+            del cell[previous.get_name()]
+            if not cell:
+                del self._clinic_cells[previous.get_cell()]
+        self._clinics[clinic.get_name()] = clinic
+        self._clinic_cells.setdefault(clinic.get_cell(), {})[clinic.get_name()] = clinic
+
+    def get_clinic(self, name: str) -> Optional[Clinic]:
+        return self._clinics.get(name)
+
+    def get_clinics_near(self, name: str, radius: float) -> List[Clinic]:
+        # Clinics within radius of the named clinic (itself included), nearest first. Only the
+        # grid cells overlapping the radius are read, or every occupied cell if that is fewer
+        origin = self._clinics.get(name)
+        if not origin:
+            return []
+        x, y = origin.get_location()
+        low_x, low_y = int((x - radius) // CLINIC_CELL_SIZE), int((y - radius) // CLINIC_CELL_SIZE)
+        high_x, high_y = int((x + radius) // CLINIC_CELL_SIZE), int((y + radius) // CLINIC_CELL_SIZE)
+        if (high_x - low_x + 1) * (high_y - low_y + 1) <= len(self._clinic_cells):
+            cells = [self._clinic_cells.get((cell_x, cell_y)) for cell_x in range(low_x, high_x + 1)
+                     for cell_y in range(low_y, high_y + 1)]
+        else:
+            cells = [cell for (cell_x, cell_y), cell in self._clinic_cells.items()
+                     if low_x <= cell_x <= high_x and low_y <= cell_y <= high_y]
+        nearby = [clinic for cell in cells if cell for clinic in cell.values() if origin.distance_to(clinic) <= radius]
+        return sorted(nearby, key=origin.distance_to)
+
+    def get_doctor_lock(self, name: str):
+        return self._doctor_locks.get(name)
+
+    def lock_doctors(self, stack: ExitStack, names: List[str]):
+        # Take several doctor locks in name order so concurrent batches cannot deadlock
+        if not self._thread_safe:
+            return
+        for name in sorted(set(names)):
+            stack.enter_context(self._doctor_locks[name])
+
     def add_patient(self, patient: Patient):
         self._patients[patient.name] = patient
 
     def get_patient(self, name: str) -> Patient:
         return self._patients.get(name)
 
-    def add_booking(self, booking: Dict) -> int:
-        booking_id = len(self._bookings) + 1
+    def add_booking(self, booking: Dict, booking_id: Optional[int] = None) -> int:
+        # Booking IDs are monotonic so they never collide after a cancellation,
+        # callers that reserved a block pass their own ID
+        if booking_id is None:
+            booking_id = self.reserve_booking_ids(1)
         self._bookings[booking_id] = booking
         return booking_id
 
+    def reserve_booking_ids(self, count: int) -> int:
+        # Reserve count consecutive booking IDs and return the first one
+        with self._booking_id_lock:
+            booking_id = self._next_booking_id
+            self._next_booking_id += count
+        return booking_id
+
     def get_booking(self, booking_id: int) -> Dict:
         return self._bookings.get(booking_id)
 
     def remove_booking(self, booking_id: int):
-        if booking_id in self._bookings:
-            del self._bookings[booking_id]
+        self._bookings.pop(booking_id, None)
 
-    def add_to_waitlist(self, doctor_name: str, patient_name: str, slot: TimeSlot, booking_id: int):
+    def add_to_waitlist(self, doctor_name: str, patient: Patient, start_minute: int, booking_id: int):
         doctor = self.get_doctor(doctor_name)
         if doctor:
-            doctor.add_to_waitlist(slot, patient_name, booking_id)
-    def remove_from_waitlist(self, doctor_name: str, patient_name: str, slot: TimeSlot):
+            doctor.add_to_waitlist(start_minute, patient, booking_id)
+
+    def remove_from_waitlist(self, doctor_name: str, start_minute: int, booking_id: int) -> bool:
         doctor = self.get_doctor(doctor_name)
         if doctor:
-            doctor.remove_from_waitlist(slot, patient_name)
+            return doctor.remove_from_waitlist(start_minute, booking_id)
+        return False
 
-    def get_waitlist(self, doctor_name: str) -> Dict:
+    def get_waitlist(self, doctor_name: str, start_minute: int) -> Optional[Waitlist]:
         doctor = self.get_doctor(doctor_name)
         if doctor:
-            return doctor.waitlist
-        return {}
+            return doctor.get_waitlist(start_minute)
+        return None
+
+    def get_doctors_by_specialty(self, specialty: str) -> List[Doctor]:
+        return list(self._doctors_by_specialty.get(specialty, {}).values())
+
+    def add_free_slot(self, doctor: Doctor, start_minute: int):
+        # Insert the slot into the specialty and clinic indexes, ignoring duplicates
+        self.add_free_slots(doctor, [start_minute])
+
+    def add_free_slots(self, doctor: Doctor, start_minutes: List[int]):
+        with self._index_lock:
+            by_specialty = self._free_slots_by_specialty.setdefault(
+                doctor.get_specialty(), self._new_free_slot_index())
+            by_clinic = None
+            if doctor.get_clinic():
+                by_clinic = self._free_slots_by_clinic.setdefault(
+                    (doctor.get_specialty(), doctor.get_clinic()), self._new_free_slot_index())
+            for start_minute in start_minutes:
+                by_specialty.add(start_minute, doctor.get_name())
+                if by_clinic is not None:
+                    by_clinic.add(start_minute, doctor.get_name())
+
+    def remove_free_slots(self, entries: List[Tuple[Doctor, int]]):
+        # Batch form of remove_free_slot taking (doctor, start minute) pairs under one lock
+        with self._index_lock:
+            for doctor, start_minute in entries:
+                index = self._free_slots_by_specialty.get(doctor.get_specialty())
+                if index:
+                    index.remove(start_minute, doctor.get_name())
+                index = self._free_slots_by_clinic.get((doctor.get_specialty(), doctor.get_clinic()))
+                if index:
+                    index.remove(start_minute, doctor.get_name())
+
+    def remove_free_slot(self, doctor: Doctor, start_minute: int):
+        self.remove_free_slots([(doctor, start_minute)])
+
+    def get_free_slots(self, specialty: str, limit: Optional[int] = None, offset: int = 0,
+                       from_minute: Optional[int] = None) -> List[Tuple[int, str]]:
+        # Return a page of (start minute, doctor name) entries ordered by start time, then doctor.
+        # Readers skip _index_lock: concurrent indexes are copy-on-write, see ConcurrentFreeSlotIndex
+        index = self._free_slots_by_specialty.get(specialty)
+        return index.page(offset, limit, from_minute) if index else []
+
+    def get_earliest_free_slot(self, specialty: str, from_minute: Optional[int] = None,
+                               to_minute: Optional[int] = None) -> Optional[Tuple[int, str]]:
+        index = self._free_slots_by_specialty.get(specialty)
+        return index.first(from_minute, to_minute) if index else None
+
+    def get_earliest_free_slot_at_clinic(self, specialty: str, clinic_name: str, from_minute: Optional[int] = None,
+                                         to_minute: Optional[int] = None) -> Optional[Tuple[int, str]]:
+        index = self._free_slots_by_clinic.get((specialty, clinic_name))
+        return index.first(from_minute, to_minute) if index else None
+
+    def to_snapshot(self) -> Dict:
+        # Compact, JSON-friendly copy of the whole repository
+        return {
+            "next_booking_id": self._next_booking_id,
+            "clinics": [[clinic.get_name(), *clinic.get_location()] for clinic in self._clinics.values()],
+            "doctors": [doctor.to_snapshot() for doctor in self._doctors.values()],
+            "patients": [[name, list(patient.appointments)] for name, patient in self._patients.items()],
+            "bookings": [
+                [booking_id, booking["patient"].get_name(), booking["doctor"].get_name(), booking["start_minute"]]
+                for booking_id, booking in self._bookings.items()
+            ],
+        }
+
+    @staticmethod
+    def from_snapshot(state: Dict, thread_safe: bool = False) -> 'InMemoryRepository':
+        repository = InMemoryRepository(thread_safe)
+        repository._next_booking_id = state["next_booking_id"]
+        for name, _ in state["patients"]:
+            repository.add_patient(Patient(name))
+
+        for name, x, y in state["clinics"]:
+            repository.add_clinic(Clinic(name, x, y))
+
+        doctor_state = {}
+        for name, specialty, clinic, available_masks, appointments, waitlists in state["doctors"]:
+            doctor = Doctor(name, specialty, clinic)
+            doctor._available_masks = {day: mask for day, mask in available_masks}
+            repository.add_doctor(doctor)
+            doctor_state[name] = (appointments, waitlists)
+
+        for booking_id, patient_name, doctor_name, start in state["bookings"]:
+            repository._bookings[booking_id] = {
+                "patient": repository.get_patient(patient_name),
+                "doctor": repository.get_doctor(doctor_name),
+                "start_minute": start,
+            }
+
+        for doctor in repository._doctors.values():
+            appointments, waitlists = doctor_state[doctor.get_name()]
+            for booking_id, start in appointments:
+                doctor.add_appointment(booking_id, start)
+            for start, booking_ids in waitlists:
+                for booking_id in booking_ids:
+                    doctor.add_to_waitlist(start, repository._bookings[booking_id]["patient"], booking_id)
+        for name, booking_ids in state["patients"]:
+            patient = repository.get_patient(name)
+            for booking_id in booking_ids:
+                booking = repository._bookings[booking_id]
+                patient.add_appointment(booking_id, booking["start_minute"], booking["doctor"].get_name())
+
+        for doctor in repository._doctors.values():
+            repository.add_free_slots(doctor, doctor.get_free_starts())
+        return repository
+
+
+# EventLog (abstract class) for durable System state
+class EventLog(ABC):
+    def load(self) -> Tuple[Optional[Dict], Iterator[list]]:
+        # Return the latest snapshot (or None) and the events logged after it
+        pass
+
+    def append(self, event: list):
+        pass
+
+    def snapshot_due(self) -> bool:
+        pass
+
+    def write_snapshot(self, state: Dict):
+        pass
+
+    def close(self):
+        pass
+
+
+# Append-only JSONL write-ahead log plus periodic compact snapshots
+class JsonlEventLog(EventLog):
+    def __init__(self, directory: str, snapshot_every: int = 100_000, fsync: bool = False):
+        os.makedirs(directory, exist_ok=True)
+        self._wal_path = os.path.join(directory, "flipfine.wal")
+        self._snapshot_path = os.path.join(directory, "flipfine.snapshot")
+        self._snapshot_every = snapshot_every
+        self._fsync = fsync
+        self._seq = 0  # Sequence number of the last logged event
+        self._since_snapshot = 0
+        self._file = None
+        self.bytes_written = 0  # WAL plus snapshot bytes, for write amplification reporting
+
+    def load(self) -> Tuple[Optional[Dict], Iterator[list]]:
+        snapshot = None
+        if os.path.exists(self._snapshot_path):
+            with open(self._snapshot_path, "r") as f:
+                snapshot = json.load(f)
+            self._seq = snapshot["seq"]
+        return snapshot, self._read_tail()
+
+    def _read_tail(self) -> Iterator[list]:
+        # Yield events newer than the snapshot, stopping at a torn final write
+        if not os.path.exists(self._wal_path):
+            return
+        good_offset = 0
+        with open(self._wal_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                good_offset += len(line)
+                if record[0] <= self._seq:
+                    continue
+                self._seq = record[0]
+                self._since_snapshot += 1
+                yield record[1:]
+        # Cut off a torn tail so new appends start on a clean line
+        if os.path.getsize(self._wal_path) > good_offset:
+            with open(self._wal_path, "r+b") as f:
+                f.truncate(good_offset)
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self._wal_path, "a")
+        return self._file
+
+    def append(self, event: list):
+        self._seq += 1
+        self._since_snapshot += 1
+        line = json.dumps([self._seq] + event, separators=(",", ":")) + "\n"
+        f = self._open()
+        f.write(line)
+        f.flush()
+        if self._fsync:
+            os.fsync(f.fileno())
+        self.bytes_written += len(line)
+
+    def snapshot_due(self) -> bool:
+        return self._since_snapshot >= self._snapshot_every
+
+    def write_snapshot(self, state: Dict):
+        # Write the snapshot atomically, then start an empty log: events up to
+        # state["seq"] are skipped on load even if we crash before truncating
+        state["seq"] = self._seq
+        data = json.dumps(state, separators=(",", ":"))
+        tmp_path = self._snapshot_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._snapshot_path)
+        self.bytes_written += len(data)
+
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self._wal_path, "w")
+        self._since_snapshot = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# ClinicService (abstract class)
+class ClinicService(ABC):
+    def register_clinic(self, name: str, x: float, y: float) -> str:
+        pass
+
+
+# ClinicServiceImpl (concrete class)
+class ClinicServiceImpl(ClinicService):
+    def __init__(self, repository: InMemoryRepository):
+        self._repository = repository
+
+    def register_clinic(self, name: str, x: float, y: float) -> str:
+        self._repository.add_clinic(Clinic(name, x, y))
+        return f"Clinic {name} registered."
 
 
 # DoctorService (abstract class)
 class DoctorService(ABC):
-    def register_doc(self, name: str, specialty: str) -> str:
+    def register_doc(self, name: str, specialty: str, clinic: Optional[str] = None) -> str:
         pass
 
     def mark_doc_avail(self, doctor_name: str, slots: List[str]) -> str:
         pass
 
+    def mark_doc_avail_bulk(self, doctor_name: str, start_minutes: List[int]) -> str:
+        pass
+
     def show_avail_by_specialty(self, specialty: str) -> List[str]:
         pass
 
+    def show_next_free_slots(self, specialty: str, limit: int, offset: int = 0,
+                             from_time: Optional[str] = None) -> List[str]:
+        pass
+
+    def show_earliest_free_slot(self, specialty: str) -> str:
+        pass
+
+    def show_doctors_free_in_window(self, specialty: str, from_time: str, to_time: str) -> List[str]:
+        pass
+
+    def show_first_free_slot_near(self, specialty: str, clinic: str, from_date: Optional[str] = None,
+                                  days: int = 14, radius: float = DEFAULT_NEARBY_RADIUS) -> str:
+        pass
+
 
 # DoctorServiceImpl (concrete class)
 class DoctorServiceImpl(DoctorService):
     def __init__(self, repository: InMemoryRepository):
         self._repository = repository
 
-    def register_doc(self, name: str, specialty: str) -> str:
-        doctor = Doctor(name, specialty)
+    def register_doc(self, name: str, specialty: str, clinic: Optional[str] = None) -> str:
+        if clinic and not self._repository.get_clinic(clinic):
+            return f"Clinic {clinic} is not registered."
+        doctor = Doctor(name, specialty, clinic)
         self._repository.add_doctor(doctor)
         return f"Welcome Dr. {name} !!"
 
@@ -176,25 +1013,90 @@ class DoctorServiceImpl(DoctorService):
         if not doctor:
             return f"Doctor {doctor_name} is not registered."
 
+        with self._repository.get_doctor_lock(doctor_name):
+            return self._mark_doc_avail_locked(doctor, doctor_name, slots)
+
+    def _mark_doc_avail_locked(self, doctor: Doctor, doctor_name: str, slots: List[str]) -> str:
         for slot in slots:
-            start, end = slot.split("-")
-            new_slot = TimeSlot(start, end)
+            new_slot = TimeSlot.parse(slot)
             if not new_slot.duration_valid():
                 return f"Sorry Dr. {doctor_name}, slots are 30 mins only."
-            if not new_slot.within_business_hours():
+            # The hour check alone lets through slots such as 23:30-00:00, which the calendars
+            # and from_minutes cannot represent, so the whole slot must fit the business day
+            if not slot_in_business_hours(new_slot.start_minute):
                 return f"Sorry Dr. {doctor_name}, slots must be between 9:00 AM and 9:00 PM."
-            doctor.add_slot(new_slot)
+            # Only the start minute is kept, TimeSlot objects live at the API edge
+            doctor.add_slot(new_slot.start_minute)
+            if not doctor.is_minute_booked(new_slot.start_minute):
+                self._repository.add_free_slot(doctor, new_slot.start_minute)
 
         return "Done Doc!"
 
-    def show_avail_by_specialty(self, specialty: str) -> List[str]:
+    def mark_doc_avail_bulk(self, doctor_name: str, start_minutes: List[int]) -> str:
+        # Pre-parsed absolute start minutes (see parse_start); the whole batch is validated
+        # before anything is applied, so it is all or nothing
+        doctor = self._repository.get_doctor(doctor_name)
+        if not doctor:
+            return f"Doctor {doctor_name} is not registered."
+        for start_minute in start_minutes:
+            if not slot_in_business_hours(start_minute):
+                return f"Sorry Dr. {doctor_name}, slots must be between 9:00 AM and 9:00 PM."
+
+        with self._repository.get_doctor_lock(doctor_name):
+            doctor.add_slots(start_minutes)
+            self._repository.add_free_slots(
+                doctor, [start_minute for start_minute in start_minutes if not doctor.is_minute_booked(start_minute)])
+        return "Done Doc!"
+
+    def _format_free_slots(self, entries: List[Tuple[int, str]]) -> List[str]:
         available = []
-        for doctor in self._repository._doctors.values():
-            if doctor.get_specialty() == specialty:
-                for slot in doctor.get_available_slots():
-                    available.append(f"{doctor.get_name()}: {slot}")
+        for start_minute, doctor_name in entries:
+            available.append(format_free_slot(start_minute, doctor_name))
         return available
 
+    def show_avail_by_specialty(self, specialty: str) -> List[str]:
+        return self._format_free_slots(self._repository.get_free_slots(specialty))
+
+    def show_next_free_slots(self, specialty: str, limit: int, offset: int = 0,
+                             from_time: Optional[str] = None) -> List[str]:
+        # Paginated view of free slots for a specialty, optionally starting at from_time
+        from_minute = parse_start(from_time) if from_time else None
+        return self._format_free_slots(self._repository.get_free_slots(specialty, limit, offset, from_minute))
+
+    def show_earliest_free_slot(self, specialty: str) -> str:
+        entry = self._repository.get_earliest_free_slot(specialty)
+        if not entry:
+            return f"No free slots for {specialty}."
+        return self._format_free_slots([entry])[0]
+
+    def show_doctors_free_in_window(self, specialty: str, from_time: str, to_time: str) -> List[str]:
+        # Doctors with at least one free slot starting in [from_time, to_time) on from_time's day,
+        # one AND per doctor
+        day, from_minute = divmod(parse_start(from_time), MINUTES_PER_DAY)
+        window = window_mask(from_minute, parse_start(to_time) % MINUTES_PER_DAY)
+        return [doctor.get_name() for doctor in self._repository.get_doctors_by_specialty(specialty)
+                if doctor.get_free_mask(day) & window]
+
+    def show_first_free_slot_near(self, specialty: str, clinic: str, from_date: Optional[str] = None,
+                                  days: int = 14, radius: float = DEFAULT_NEARBY_RADIUS) -> str:
+        # Earliest free slot in [from_date, from_date + days) at clinics within radius of the given one,
+        # one index lookup per nearby clinic
+        if not self._repository.get_clinic(clinic):
+            return f"Clinic {clinic} is not registered."
+        day = day_of(from_date) if from_date else datetime.date.today().toordinal()
+        from_minute, to_minute = day * MINUTES_PER_DAY, (day + days) * MINUTES_PER_DAY
+
+        best = None
+        for nearby in self._repository.get_clinics_near(clinic, radius):
+            entry = self._repository.get_earliest_free_slot_at_clinic(
+                specialty, nearby.get_name(), from_minute, to_minute)
+            if entry and (best is None or entry < best[0]):
+                best = (entry, nearby.get_name())
+        if not best:
+            return f"No free slots for {specialty} near {clinic} in the next {days} days."
+        (start_minute, doctor_name), clinic_name = best
+        return f"{doctor_name} at {clinic_name}: {TimeSlot.from_minutes(start_minute, start_minute + SLOT_MINUTES)}"
+
 
 # PatientService (abstract class)
 class PatientService(ABC):
@@ -218,24 +1120,34 @@ class BookingService(ABC):
     def book_appointment(self, patient_name: str, doctor_name: str, start_time: str) -> str:
         pass
 
+    def book_many(self, requests: List[Tuple[str, str, str]]) -> List[str]:
+        pass
+
     def cancel_booking(self, booking_id: int) -> str:
         pass
 
     def view_appointments(self, patient_name: str) -> str:
         pass
 
+    def get_appointments(self, patient_name: str) -> Optional[List[Appointment]]:
+        pass
+
+    def get_waitlist_position(self, booking_id: int) -> str:
+        pass
+
 
 # BookingServiceImpl (concrete class)
 class BookingServiceImpl(BookingService):
     def __init__(self, repository: InMemoryRepository):
         self._repository = repository
 
-    def _find_slot_for_time(self, doctor: Doctor, start_time: str) -> TimeSlot:
-        # Helper function to find a slot for the given time
-        for slot in doctor.get_available_slots():
-            if slot.start_time.strftime("%H:%M") == start_time:
-                return slot
-        return None
+    def _find_slot_for_time(self, doctor: Doctor, start_time: str) -> Optional[int]:
+        # Helper function to find the start minute of an available slot for the given time
+        try:
+            start_minute = parse_start(start_time)
+        except ValueError:
+            return None
+        return start_minute if doctor.has_slot(start_minute) else None
 
     def book_appointment(self, patient_name: str, doctor_name: str, start_time: str) -> str:
         # Fetch the doctor and patient from the repository
@@ -243,105 +1155,372 @@ class BookingServiceImpl(BookingService):
         doctor = self._repository.get_doctor(doctor_name)
         if not patient or not doctor:
             return "Doctor or Patient not found."
-        
+
+        # Lookup, booked check and booking happen under the doctor's lock so two
+        # patients can never both get the same slot
+        with self._repository.get_doctor_lock(doctor_name):
+            return self._book_appointment_locked(patient, doctor, start_time)
+
+    def _book_appointment_locked(self, patient: Patient, doctor: Doctor, start_time: str) -> str:
         # Check if the slot is available for booking
-        slot = self._find_slot_for_time(doctor, start_time)
-        if not slot:
+        start_minute = self._find_slot_for_time(doctor, start_time)
+        if start_minute is None:
             return "Slot not available."
 
         # Check if the slot is already booked
-        if doctor.is_slot_booked(start_time):
+        if doctor.is_minute_booked(start_minute):
             # If slot is already booked, check if the patient should be added to waitlist
-            booking_id = self._repository.add_booking({'patient': patient, 'doctor': doctor, 'slot': slot})
-            doctor.add_to_waitlist(slot, patient, booking_id)
+            booking_id = self._repository.add_booking({'patient': patient, 'doctor': doctor, 'start_minute': start_minute})
+            doctor.add_to_waitlist(start_minute, patient, booking_id)
             return f"Slot is booked, you have been added to the waitlist. Booking ID: {booking_id}"
         
         # Slot is available, proceed with booking
         booking_id = self._repository.add_booking({
             "patient": patient,
             "doctor": doctor,
-            "slot": slot
+            "start_minute": start_minute
         })
 
         # Update doctor and patient
-        doctor.add_appointment(booking_id, slot)
-        patient.add_appointment(booking_id, slot)
+        doctor.add_appointment(booking_id, start_minute)
+        patient.add_appointment(booking_id, start_minute, doctor.get_name())
+        self._repository.remove_free_slot(doctor, start_minute)
         
         return f"Booked. Booking ID: {booking_id}"
 
+    def book_many(self, requests: List[Tuple[str, str, str]]) -> List[str]:
+        # Book (patient_name, doctor_name, start_time) requests in order. Results match calling
+        # book_appointment for each one, but locks, ID allocation and index updates happen once
+        get_patient, get_doctor = self._repository.get_patient, self._repository.get_doctor
+        resolved = [(get_patient(patient_name), get_doctor(doctor_name), start_time)
+                    for patient_name, doctor_name, start_time in requests]
+
+        with ExitStack() as stack:
+            self._repository.lock_doctors(stack, [doctor.get_name() for _, doctor, _ in resolved if doctor])
+
+            # Every request with a known patient, doctor and slot gets an ID, booked or waitlisted.
+            # Start times repeat a lot within a batch, so each distinct string is parsed once
+            parsed = {}
+            starts = []
+            for patient, doctor, start_time in resolved:
+                start_minute = None
+                if patient and doctor:
+                    if start_time not in parsed:
+                        try:
+                            parsed[start_time] = parse_start(start_time)
+                        except ValueError:
+                            parsed[start_time] = None
+                    start_minute = parsed[start_time]
+                    if start_minute is not None and not doctor.has_slot(start_minute):
+                        start_minute = None
+                starts.append(start_minute)
+            booking_id = self._repository.reserve_booking_ids(sum(start is not None for start in starts))
+
+            results = []
+            booked = []
+            for (patient, doctor, _), start_minute in zip(resolved, starts):
+                if not patient or not doctor:
+                    results.append("Doctor or Patient not found.")
+                    continue
+                if start_minute is None:
+                    results.append("Slot not available.")
+                    continue
+                self._repository.add_booking(
+                    {"patient": patient, "doctor": doctor, "start_minute": start_minute}, booking_id)
+                if doctor.is_minute_booked(start_minute):
+                    doctor.add_to_waitlist(start_minute, patient, booking_id)
+                    results.append(f"Slot is booked, you have been added to the waitlist. Booking ID: {booking_id}")
+                else:
+                    doctor.add_appointment(booking_id, start_minute)
+                    patient.add_appointment(booking_id, start_minute, doctor.get_name())
+                    booked.append((doctor, start_minute))
+                    results.append(f"Booked. Booking ID: {booking_id}")
+                booking_id += 1
+            self._repository.remove_free_slots(booked)
+        return results
+
     def cancel_booking(self, booking_id: str) -> str:
         # Fetch the booking from the repository
         booking = self._repository.get_booking(booking_id)
         if not booking:
             return f"Booking {booking_id} not found."
-        
+
+        # Cancellation and waitlist promotion are one atomic step under the doctor's lock
+        with self._repository.get_doctor_lock(booking['doctor'].get_name()):
+            return self._cancel_booking_locked(booking_id)
+
+    def _cancel_booking_locked(self, booking_id: int) -> str:
+        # Re-read the booking, another thread may have cancelled it while we waited
+        booking = self._repository.get_booking(booking_id)
+        if not booking:
+            return f"Booking {booking_id} not found."
+
         patient = booking['patient']
         doctor = booking['doctor']
-        slot = booking['slot']
+        start_minute = booking['start_minute']
         
         # Cancel the appointment
         patient.remove_appointment(booking_id)
-        doctor.remove_appointment(booking_id)
-        
+        held_slot = doctor.remove_appointment(booking_id)
+        self._repository.remove_booking(booking_id)
+        if not held_slot:
+            # A waitlisted booking never held the slot, just leave the queue
+            doctor.remove_from_waitlist(start_minute, booking_id)
+            return f"Booking {booking_id} removed from the waitlist."
+
         # Make the slot available again
-        doctor.add_slot(slot)  # Re-add the slot to available slots
-        
-        # Remove from waitlist if any patient is waiting for this slot
-        if doctor.has_waitlist_for_slot(slot):
-            # Get the first patient from the waitlist for this slot
-            next_patient, booking_id = doctor.get_first_waitlist_patient_for_slot(slot)
-            # Remove the patient from the waitlist
-            doctor.remove_from_waitlist(slot, next_patient, booking_id)
-            
+        doctor.add_slot(start_minute)  # Re-add the slot to available slots
+
+        # Promote the first patient waiting for this slot, if any
+        if doctor.has_waitlist_for_slot(start_minute):
+            next_patient, booking_id = doctor.pop_waitlist_for_slot(start_minute)
+
             # Update both the doctor and patient's objects
-            doctor.add_appointment(booking_id, slot)
-            next_patient.add_appointment(booking_id, slot)
+            doctor.add_appointment(booking_id, start_minute)
+            next_patient.add_appointment(booking_id, start_minute, doctor.get_name())
 
             return f"Appointment cancelled. The next patient in waitlist has been assigned the slot. New booking ID: {booking_id}"
 
+        if not doctor.is_minute_booked(start_minute):
+            self._repository.add_free_slot(doctor, start_minute)
         return f"Appointment cancelled. Slot is now available."
 
+    def get_waitlist_position(self, booking_id: int) -> str:
+        booking = self._repository.get_booking(booking_id)
+        if not booking:
+            return f"Booking {booking_id} not found."
+        with self._repository.get_doctor_lock(booking['doctor'].get_name()):
+            position = booking['doctor'].get_waitlist_position(booking['start_minute'], booking_id)
+        if position is None:
+            return f"Booking {booking_id} is not on a waitlist."
+        return f"Booking {booking_id} is at position {position} on the waitlist."
+
     def view_appointments(self, patient_name: str) -> str:
         patient = self._repository.get_patient(patient_name)
         if not patient:
             return f"Patient {patient_name} is not registered."
 
-        appointments = []
-        for booking_id, slot in patient.appointments.items():
-            booking = self._repository.get_booking(booking_id)
-            appointments.append(f"booking id: {booking_id}, doctor: {booking['doctor'].get_name()}, slot: {slot}")
-        return "\n".join(appointments) if appointments else "No appointments."
+        return patient.format_appointments()
+
+    def get_appointments(self, patient_name: str) -> Optional[List[Appointment]]:
+        # Structured records for callers that do their own formatting
+        patient = self._repository.get_patient(patient_name)
+        return patient.get_appointments() if patient else None
 
 
 # System class
 class System:
-    def __init__(self):
-        self._repository = InMemoryRepository()
+    def __init__(self, concurrent: bool = False, event_log: Optional[EventLog] = None):
+        # concurrent=True enables per-doctor locking for use from multiple worker threads.
+        # With an event_log, state is recovered from its snapshot plus log tail and every
+        # write is logged; logged writes are serialized so replay order matches apply order.
+        self._event_log = None
+        self._log_lock = threading.Lock() if concurrent else nullcontext()
+        snapshot, events = event_log.load() if event_log else (None, [])
+        if snapshot:
+            self._repository = InMemoryRepository.from_snapshot(snapshot, thread_safe=concurrent)
+        else:
+            self._repository = InMemoryRepository(thread_safe=concurrent)
+        self._clinic_service = ClinicServiceImpl(self._repository)
         self._doctor_service = DoctorServiceImpl(self._repository)
         self._patient_service = PatientServiceImpl(self._repository)
         self._booking_service = BookingServiceImpl(self._repository)
-
-    def register_doc(self, name: str, specialty: str) -> str:
-        return self._doctor_service.register_doc(name, specialty)
+        for event in events:
+            self._apply(event)
+        self._event_log = event_log
+
+    def _apply(self, event: list):
+        kind = event[0]
+        if kind == "register_clinic":
+            return self._clinic_service.register_clinic(event[1], event[2], event[3])
+        if kind == "register_doc":
+            return self._doctor_service.register_doc(event[1], event[2], event[3] if len(event) > 3 else None)
+        if kind == "mark_doc_avail":
+            return self._doctor_service.mark_doc_avail(event[1], event[2])
+        if kind == "mark_doc_avail_bulk":
+            return self._doctor_service.mark_doc_avail_bulk(event[1], event[2])
+        if kind == "register_patient":
+            return self._patient_service.register_patient(event[1])
+        if kind == "book":
+            return self._booking_service.book_appointment(event[1], event[2], event[3])
+        if kind == "book_many":
+            return self._booking_service.book_many(event[1])
+        if kind == "cancel":
+            return self._booking_service.cancel_booking(event[1])
+        raise ValueError(f"Unknown event {kind}")
+
+    def _write(self, event: list):
+        if self._event_log is None:
+            return self._apply(event)
+        with self._log_lock:
+            # Apply first so calls that raise are never logged; the caller only
+            # sees the result once the event is in the log
+            result = self._apply(event)
+            self._event_log.append(event)
+            if self._event_log.snapshot_due():
+                self._event_log.write_snapshot(self._repository.to_snapshot())
+            return result
+
+    def checkpoint(self):
+        # Force a snapshot so the next startup replays nothing
+        if self._event_log is not None:
+            with self._log_lock:
+                self._event_log.write_snapshot(self._repository.to_snapshot())
+
+    def close(self):
+        if self._event_log is not None:
+            self._event_log.close()
+
+    def register_clinic(self, name: str, x: float, y: float) -> str:
+        return self._write(["register_clinic", name, x, y])
+
+    def register_doc(self, name: str, specialty: str, clinic: Optional[str] = None) -> str:
+        if clinic is None:
+            return self._write(["register_doc", name, specialty])
+        return self._write(["register_doc", name, specialty, clinic])
 
     def mark_doc_avail(self, name: str, slots: List[str]) -> str:
-        return self._doctor_service.mark_doc_avail(name, slots)
+        return self._write(["mark_doc_avail", name, list(slots)])
+
+    def mark_doc_avail_bulk(self, name: str, start_minutes: List[int]) -> str:
+        return self._write(["mark_doc_avail_bulk", name, list(start_minutes)])
 
     def show_avail_by_specialty(self, specialty: str) -> List[str]:
         return self._doctor_service.show_avail_by_specialty(specialty)
 
+    def show_next_free_slots(self, specialty: str, limit: int, offset: int = 0,
+                             from_time: Optional[str] = None) -> List[str]:
+        return self._doctor_service.show_next_free_slots(specialty, limit, offset, from_time)
+
+    def show_earliest_free_slot(self, specialty: str) -> str:
+        return self._doctor_service.show_earliest_free_slot(specialty)
+
+    def show_doctors_free_in_window(self, specialty: str, from_time: str, to_time: str) -> List[str]:
+        return self._doctor_service.show_doctors_free_in_window(specialty, from_time, to_time)
+
+    def show_first_free_slot_near(self, specialty: str, clinic: str, from_date: Optional[str] = None,
+                                  days: int = 14, radius: float = DEFAULT_NEARBY_RADIUS) -> str:
+        return self._doctor_service.show_first_free_slot_near(specialty, clinic, from_date, days, radius)
+
+    def get_free_slots(self, specialty: str, limit: Optional[int] = None, offset: int = 0,
+                       from_minute: Optional[int] = None) -> List[Tuple[int, str]]:
+        # Unformatted (start minute, doctor name) page, see InMemoryRepository.get_free_slots
+        return self._repository.get_free_slots(specialty, limit, offset, from_minute)
+
     def register_patient(self, name: str) -> str:
-        return self._patient_service.register_patient(name)
+        return self._write(["register_patient", name])
 
     def book_appointment(self, patient_name: str, doctor_name: str, start_time: str) -> str:
-        return self._booking_service.book_appointment(patient_name, doctor_name, start_time)
+        return self._write(["book", patient_name, doctor_name, start_time])
+
+    def book_many(self, requests: List[Tuple[str, str, str]]) -> List[str]:
+        return self._write(["book_many", [list(request) for request in requests]])
 
     def cancel_booking(self, booking_id: int) -> str:
-        return self._booking_service.cancel_booking(booking_id)
+        return self._write(["cancel", booking_id])
 
     def view_appointments(self, patient_name: str) -> str:
         return self._booking_service.view_appointments(patient_name)
 
+    def get_appointments(self, patient_name: str) -> Optional[List[Appointment]]:
+        return self._booking_service.get_appointments(patient_name)
+
+    def get_waitlist_position(self, booking_id: int) -> str:
+        return self._booking_service.get_waitlist_position(booking_id)
+
+    def get_booking_doctor(self, booking_id: int) -> Optional[str]:
+        booking = self._repository.get_booking(booking_id)
+        return booking["doctor"].get_name() if booking else None
+
+
+# asyncio front-end for System. Writes run on an executor and are serialized per doctor through
+# one asyncio queue each. Availability and appointment reads run directly on the loop: the
+# concurrent System's free-slot indexes are copy-on-write, so those reads take no lock and never
+# wait behind writes. The full availability listing is read a page at a time, yielding in between.
+class AsyncSystem:
+    READ_PAGE_SIZE = 1_000  # Free slots read and formatted per turn of the loop
+
+    def __init__(self, system: Optional[System] = None, executor: Optional[Executor] = None):
+        # Writes for different doctors run in parallel threads, so the System must be concurrent
+        self._system = system if system is not None else System(concurrent=True)
+        self._executor = executor
+        self._queues = {}  # Doctor name -> asyncio.Queue of (function, args, future)
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _submit(self, doctor_name: str, function, *args) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(doctor_name)
+        if queue is None:
+            queue = self._queues[doctor_name] = asyncio.Queue()
+            asyncio.get_running_loop().create_task(self._drain(doctor_name, queue))
+        queue.put_nowait((function, args, future))
+        return future
+
+    async def _drain(self, doctor_name: str, queue: asyncio.Queue):
+        # One worker per doctor with pending writes, it exits once the queue is empty
+        while True:
+            try:
+                function, args, future = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                del self._queues[doctor_name]
+                return
+            try:
+                result = await self._run(function, *args)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+
+    async def register_doc(self, name: str, specialty: str, clinic: Optional[str] = None) -> str:
+        return await self._submit(name, self._system.register_doc, name, specialty, clinic)
+
+    async def register_patient(self, name: str) -> str:
+        return await self._run(self._system.register_patient, name)
+
+    async def mark_doc_avail(self, name: str, slots: List[str]) -> str:
+        return await self._submit(name, self._system.mark_doc_avail, name, slots)
+
+    async def show_avail_by_specialty(self, specialty: str) -> List[str]:
+        # Each page resumes at the last page's final start minute, skipping the entries
+        # already taken there, so the scan never walks back over earlier minutes
+        available = []
+        from_minute, offset = None, 0
+        while True:
+            entries = self._system.get_free_slots(specialty, self.READ_PAGE_SIZE, offset, from_minute)
+            available.extend(format_free_slot(start_minute, doctor_name) for start_minute, doctor_name in entries)
+            if len(entries) < self.READ_PAGE_SIZE:
+                return available
+            last_minute = entries[-1][0]
+            if last_minute == from_minute:
+                offset += len(entries)
+            else:
+                offset = sum(1 for start_minute, _ in entries if start_minute == last_minute)
+                from_minute = last_minute
+            await asyncio.sleep(0)
+
+    async def show_next_free_slots(self, specialty: str, limit: int, offset: int = 0,
+                                   from_time: Optional[str] = None) -> List[str]:
+        return self._system.show_next_free_slots(specialty, limit, offset, from_time)
+
+    async def book_appointment(self, patient_name: str, doctor_name: str, start_time: str) -> str:
+        return await self._submit(doctor_name, self._system.book_appointment, patient_name, doctor_name, start_time)
+
+    async def cancel_booking(self, booking_id: int) -> str:
+        doctor_name = self._system.get_booking_doctor(booking_id)
+        if doctor_name is None:
+            return f"Booking {booking_id} not found."
+        return await self._submit(doctor_name, self._system.cancel_booking, booking_id)
+
+    async def view_appointments(self, patient_name: str) -> str:
+        return self._system.view_appointments(patient_name)
+
+    async def get_appointments(self, patient_name: str) -> Optional[List[Appointment]]:
+        return self._system.get_appointments(patient_name)
+
 
 if __name__ == "__main__":
     system = System()
@@ -392,3 +1571,21 @@ if __name__ == "__main__":
     # Register another Dermatologist
     print(system.register_doc("Daring", "Dermatologist"))
     print(system.mark_doc_avail("Daring", ["11:30-12:00", "14:00-14:30"]))  # Valid slots
+
+    # Paginated and earliest free slot queries
+    print(system.show_next_free_slots("Dermatologist", 2))
+    print(system.show_next_free_slots("Dermatologist", 2, offset=2))
+    print(system.show_earliest_free_slot("Dermatologist"))
+    print(system.show_doctors_free_in_window("Dermatologist", "11:00", "13:00"))
+
+    # Multi-day, multi-clinic scheduling
+    print(system.register_clinic("Indiranagar", 0, 0))
+    print(system.register_clinic("Koramangala", 3, 4))
+    print(system.register_doc("Careful", "Cardiologist", "Indiranagar"))
+    print(system.mark_doc_avail("Careful", ["2026-10-21 10:00-10:30", "2026-10-22 09:00-09:30"]))
+    print(system.register_doc("Cheerful", "Cardiologist", "Koramangala"))
+    print(system.mark_doc_avail("Cheerful", ["2026-10-20 17:00-17:30"]))
+    print(system.show_first_free_slot_near("Cardiologist", "Indiranagar", from_date="2026-10-18"))
+    print(system.book_appointment("PatientA", "Cheerful", "2026-10-20 17:00"))
+    print(system.show_first_free_slot_near("Cardiologist", "Indiranagar", from_date="2026-10-18"))
+    print(system.view_appointments("PatientA"))
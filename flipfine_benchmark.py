@@ -0,0 +1,297 @@
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from FlipFine import System, AsyncSystem, JsonlEventLog, parse_start
+
+
+# All 30-minute slots between 09:00 and 21:00
+def full_day_slots() -> list:
+    slots = []
+    for start in range(9 * 60, 21 * 60, 30):
+        end = start + 30
+        slots.append(f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}")
+    return slots
+
+
+def build_system(num_doctors: int, num_patients: int, concurrent: bool = False) -> System:
+    system = System(concurrent=concurrent)
+    slots = full_day_slots()
+    for i in range(num_doctors):
+        system.register_doc(f"doc{i}", "Cardiologist" if i % 2 == 0 else "Dermatologist")
+        system.mark_doc_avail(f"doc{i}", slots)
+    for i in range(num_patients):
+        system.register_patient(f"patient{i}")
+    return system
+
+
+def bench_booking(num_doctors: int, num_bookings: int, num_patients: int, seed: int):
+    rng = random.Random(seed)
+    start_times = [slot.split("-")[0] for slot in full_day_slots()]
+
+    started = time.perf_counter()
+    system = build_system(num_doctors, num_patients)
+    setup_time = time.perf_counter() - started
+
+    requests = [
+        (f"patient{rng.randrange(num_patients)}", f"doc{rng.randrange(num_doctors)}", rng.choice(start_times))
+        for _ in range(num_bookings)
+    ]
+
+    booked = waitlisted = 0
+    started = time.perf_counter()
+    for patient_name, doctor_name, start_time in requests:
+        result = system.book_appointment(patient_name, doctor_name, start_time)
+        if result.startswith("Booked"):
+            booked += 1
+        else:
+            waitlisted += 1
+    elapsed = time.perf_counter() - started
+
+    print(f"setup: {num_doctors} doctors, {num_patients} patients in {setup_time:.2f}s")
+    print(f"book_appointment: {num_bookings} calls in {elapsed:.2f}s "
+          f"({num_bookings / elapsed:,.0f} ops/s), booked={booked}, waitlisted={waitlisted}")
+
+
+def _booking_id(result: str) -> int:
+    return int(result.rsplit(": ", 1)[1])
+
+
+def bench_concurrent(num_threads: int, num_doctors: int, ops_per_thread: int, num_patients: int, seed: int):
+    start_times = [slot.split("-")[0] for slot in full_day_slots()]
+    system = build_system(num_doctors, num_patients, concurrent=True)
+    # Switch threads as often as possible to shake out races
+    sys.setswitchinterval(1e-6)
+
+    # Phase 1: every thread races for the same handful of slots at once
+    hot_slots = [(f"doc{i % num_doctors}", start_times[i % len(start_times)]) for i in range(8)]
+    barrier = threading.Barrier(num_threads)
+    hot_results = [[] for _ in range(num_threads)]
+
+    def race(worker: int):
+        barrier.wait()
+        for doctor_name, start_time in hot_slots:
+            result = system.book_appointment(f"patient{worker % num_patients}", doctor_name, start_time)
+            hot_results[worker].append((doctor_name, start_time, result))
+
+    # Phase 2: random bookings mixed with cancellations of the worker's own bookings
+    issued_ids = [[] for _ in range(num_threads)]
+
+    def mixed(worker: int):
+        rng = random.Random(seed + worker)
+        own = []
+        for _ in range(ops_per_thread):
+            if own and rng.random() < 0.2:
+                system.cancel_booking(own.pop(rng.randrange(len(own))))
+                continue
+            result = system.book_appointment(
+                f"patient{rng.randrange(num_patients)}", f"doc{rng.randrange(num_doctors)}", rng.choice(start_times))
+            if "Booking ID" in result:
+                booking_id = _booking_id(result)
+                own.append(booking_id)
+                issued_ids[worker].append(booking_id)
+
+    for phase in (race, mixed):
+        threads = [threading.Thread(target=phase, args=(i,)) for i in range(num_threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        total_ops = num_threads * (len(hot_slots) if phase is race else ops_per_thread)
+        print(f"{phase.__name__}: {num_threads} threads, {total_ops} ops in {elapsed:.2f}s "
+              f"({total_ops / elapsed:,.0f} ops/s)")
+
+    # Each hot slot must have been granted exactly once
+    winners = Counter((d, t) for results in hot_results for d, t, r in results if r.startswith("Booked"))
+    assert all(winners[slot] == 1 for slot in hot_slots), f"hot slot double-booked: {winners}"
+
+    # Booking IDs are never reused
+    all_ids = [booking_id for ids in issued_ids for booking_id in ids]
+    assert len(all_ids) == len(set(all_ids)), "duplicate booking IDs issued"
+
+    # No doctor holds two appointments for the same slot
+    for i in range(num_doctors):
+        minutes = list(system._repository.get_doctor(f"doc{i}").get_appointments().values())
+        assert len(minutes) == len(set(minutes)), f"doc{i} has a double-booked slot"
+    print("invariants ok: no double-booked slots, booking IDs unique")
+
+
+def _write_events(system: System, num_events: int, num_doctors: int, num_patients: int, seed: int) -> int:
+    # Register everyone, then a 4:1 mix of bookings and cancellations; returns the booking count
+    rng = random.Random(seed)
+    slots = full_day_slots()
+    start_times = [slot.split("-")[0] for slot in slots]
+    for i in range(num_doctors):
+        system.register_doc(f"doc{i}", "Cardiologist" if i % 2 == 0 else "Dermatologist")
+        system.mark_doc_avail(f"doc{i}", slots)
+    for i in range(num_patients):
+        system.register_patient(f"patient{i}")
+
+    bookings = 0
+    for _ in range(max(0, num_events - 2 * num_doctors - num_patients)):
+        if bookings and rng.random() < 0.2:
+            system.cancel_booking(rng.randint(1, bookings))
+        else:
+            system.book_appointment(
+                f"patient{rng.randrange(num_patients)}", f"doc{rng.randrange(num_doctors)}", rng.choice(start_times))
+            bookings += 1
+    return bookings
+
+
+def bench_recovery(num_events: int, num_doctors: int, num_patients: int, snapshot_every: int, seed: int):
+    for label, every in (("snapshot+tail", snapshot_every), ("log only", num_events + 1)):
+        directory = tempfile.mkdtemp(prefix="flipfine-")
+        try:
+            event_log = JsonlEventLog(directory, snapshot_every=every)
+            system = System(event_log=event_log)
+            started = time.perf_counter()
+            bookings = _write_events(system, num_events, num_doctors, num_patients, seed)
+            write_time = time.perf_counter() - started
+            system.close()
+            wal_size = os.path.getsize(os.path.join(directory, "flipfine.wal"))
+
+            started = time.perf_counter()
+            System(event_log=JsonlEventLog(directory)).close()
+            recovery_time = time.perf_counter() - started
+
+            print(f"{label}: {num_events} events written in {write_time:.2f}s, "
+                  f"{event_log.bytes_written / bookings:.1f} bytes written per booking, "
+                  f"wal tail {wal_size / 1e6:.1f} MB, recovery {recovery_time:.2f}s")
+        finally:
+            shutil.rmtree(directory)
+
+
+def bench_bulk(num_doctors: int, num_bookings: int, num_patients: int, batch_size: int, seed: int):
+    rng = random.Random(seed)
+    slots = full_day_slots()
+    start_minutes = [parse_start(slot.split("-")[0]) for slot in slots]
+    requests = [
+        (f"patient{rng.randrange(num_patients)}", f"doc{rng.randrange(num_doctors)}", slots[rng.randrange(len(slots))][:5])
+        for _ in range(num_bookings)
+    ]
+
+    timings = {}
+    for mode in ("bulk", "per-call"):
+        system = System()
+        for i in range(num_doctors):
+            system.register_doc(f"doc{i}", "Cardiologist" if i % 2 == 0 else "Dermatologist")
+        for i in range(num_patients):
+            system.register_patient(f"patient{i}")
+
+        started = time.perf_counter()
+        for i in range(num_doctors):
+            if mode == "bulk":
+                system.mark_doc_avail_bulk(f"doc{i}", start_minutes)
+            else:
+                system.mark_doc_avail(f"doc{i}", slots)
+        avail_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        if mode == "bulk":
+            results = []
+            for i in range(0, num_bookings, batch_size):
+                results.extend(system.book_many(requests[i:i + batch_size]))
+        else:
+            results = [system.book_appointment(*request) for request in requests]
+        book_time = time.perf_counter() - started
+        timings[mode] = (avail_time, book_time, results)
+
+        print(f"{mode}: {num_doctors * len(slots)} slots marked in {avail_time:.2f}s "
+              f"({num_doctors * len(slots) / avail_time:,.0f} slots/s), "
+              f"{num_bookings} bookings in {book_time:.2f}s ({num_bookings / book_time:,.0f} ops/s)")
+
+    assert timings["per-call"][2] == timings["bulk"][2], "bulk results differ from per-call results"
+    print(f"speedup: mark_doc_avail {timings['per-call'][0] / timings['bulk'][0]:.1f}x, "
+          f"booking {timings['per-call'][1] / timings['bulk'][1]:.1f}x")
+
+
+def _percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def _load_test(num_coroutines: int, num_doctors: int, num_patients: int, seed: int):
+    system = AsyncSystem()
+    slots = full_day_slots()
+    start_times = [slot.split("-")[0] for slot in slots]
+    await asyncio.gather(*(system.register_doc(f"doc{i}", "Cardiologist") for i in range(num_doctors)))
+    await asyncio.gather(*(system.mark_doc_avail(f"doc{i}", slots) for i in range(num_doctors)))
+    await asyncio.gather(*(system.register_patient(f"patient{i}") for i in range(num_patients)))
+
+    write_latencies, read_latencies, results = [], [], []
+    cancelled = set()  # Booking IDs given up again, their slot may legitimately be booked twice
+
+    async def patient_session(worker: int):
+        # Each coroutine searches, books, checks its appointments and sometimes cancels
+        rng = random.Random(seed + worker)
+        started = time.perf_counter()
+        await system.show_next_free_slots("Cardiologist", 20, from_time=rng.choice(start_times))
+        read_latencies.append(time.perf_counter() - started)
+
+        doctor_name, start_time = f"doc{rng.randrange(num_doctors)}", rng.choice(start_times)
+        started = time.perf_counter()
+        result = await system.book_appointment(f"patient{worker % num_patients}", doctor_name, start_time)
+        write_latencies.append(time.perf_counter() - started)
+        results.append((doctor_name, start_time, result))
+
+        started = time.perf_counter()
+        await system.view_appointments(f"patient{worker % num_patients}")
+        read_latencies.append(time.perf_counter() - started)
+
+        if rng.random() < 0.1 and "Booking ID" in result:
+            cancelled.add(_booking_id(result))
+            await system.cancel_booking(_booking_id(result))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(patient_session(i) for i in range(num_coroutines)))
+    elapsed = time.perf_counter() - started
+
+    # Every slot is held by at most one booking that was not cancelled
+    winners = Counter((d, t) for d, t, r in results if r.startswith("Booked") and _booking_id(r) not in cancelled)
+    assert all(count == 1 for count in winners.values()), "slot double-booked"
+    print(f"async: {num_coroutines} concurrent sessions in {elapsed:.2f}s "
+          f"({num_coroutines / elapsed:,.0f} sessions/s)")
+    print(f"  writes p50 {_percentile(write_latencies, 0.5) * 1e3:.2f}ms, p99 {_percentile(write_latencies, 0.99) * 1e3:.2f}ms")
+    print(f"  reads  p50 {_percentile(read_latencies, 0.5) * 1e3:.2f}ms, p99 {_percentile(read_latencies, 0.99) * 1e3:.2f}ms")
+
+
+def bench_async(num_coroutines: int, num_doctors: int, num_patients: int, seed: int):
+    asyncio.run(_load_test(num_coroutines, num_doctors, num_patients, seed))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FlipFine booking benchmarks")
+    parser.add_argument("--doctors", type=int, default=10_000)
+    parser.add_argument("--bookings", type=int, default=1_000_000)
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--threads", type=int, default=0, help="run the multi-threaded stress benchmark instead")
+    parser.add_argument("--ops-per-thread", type=int, default=20_000)
+    parser.add_argument("--recovery-events", type=int, default=0,
+                        help="run the WAL/snapshot recovery benchmark with this many events (e.g. 10000000)")
+    parser.add_argument("--snapshot-every", type=int, default=1_000_000)
+    parser.add_argument("--bulk", action="store_true", help="compare bulk and per-call throughput")
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    parser.add_argument("--coroutines", type=int, default=0,
+                        help="run the asyncio load test with this many concurrent coroutines (e.g. 10000)")
+    args = parser.parse_args()
+
+    if args.coroutines:
+        bench_async(args.coroutines, args.doctors, args.patients, args.seed)
+    elif args.bulk:
+        bench_bulk(args.doctors, args.bookings, args.patients, args.batch_size, args.seed)
+    elif args.recovery_events:
+        bench_recovery(args.recovery_events, args.doctors, args.patients, args.snapshot_every, args.seed)
+    elif args.threads:
+        bench_concurrent(args.threads, args.doctors, args.ops_per_thread, args.patients, args.seed)
+    else:
+        bench_booking(args.doctors, args.bookings, args.patients, args.seed)
@@ -1,17 +1,44 @@
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+
+
 class Solution:
     
-    def init(self, helper, parking: list):
+    def init(self, helper, parking: list, thread_safe: bool = False, history_limit: int = None,
+             history_ttl: float = None):
         """
         Initialize the parking lot.
 
         :param helper: Helper for logging and utility functions.
         :param parking: 3D list representing the parking structure.
+        :param thread_safe: Lock each floor, and the index of floors with free spots, so that
+            many gates can park and remove at once. Free spot counts are read without locks.
+        :param history_limit: Most past vehicle and ticket records kept for search, unbounded if None.
+        :param history_ttl: Seconds past records are kept after the vehicle left, forever if None.
         """
         self.helper = helper
         #self.helper.println(f"solution class initialized, number of floors {len(parking)}")
         self.vehicle_types = [2, 4]
-        self.floors = [ParkingFloor(i, parking[i], self.vehicle_types, helper) for i in range(len(parking))]
-        self.search_manager = SearchManager()
+        self.thread_safe = thread_safe
+        self.floors = [ParkingFloor(i, parking[i], self.vehicle_types, helper, self._new_lock())
+                       for i in range(len(parking))]
+        self.floors_lock = self._new_lock()
+        self.search_manager = SearchManager(history_limit, history_ttl, lock=self._new_lock())
+        # Locks a batch takes up front; floor locks follow as the batch reaches each floor. Every
+        # batch starts with the free-floor index lock, so only one batch nests locks at a time,
+        # and single calls never wait for a lock while holding another, so this cannot deadlock
+        self.batch_locks = [self.floors_lock, self.search_manager.lock] if thread_safe else []
+        # Min-heap of the floors that may have a free spot, per vehicle type. A floor that fills
+        # up is dropped lazily when it reaches the top; queued_floors avoids pushing a floor twice
+        self.free_floors = {vehicle_type: [] for vehicle_type in self.vehicle_types}
+        self.queued_floors = {vehicle_type: set() for vehicle_type in self.vehicle_types}
+        for i, floor in enumerate(self.floors):
+            for vehicle_type in self.vehicle_types:
+                if floor.get_free_spots_count(vehicle_type) > 0:
+                    self._queue_floor(i, vehicle_type)
 
     def park(self, vehicle_type: int, vehicle_number: str, ticket_id: str) -> str:
         """
@@ -22,13 +49,27 @@ class Solution:
         :param ticket_id: Ticket ID.
         :return: spot_id assigned to the vehicle
         """
-        for floor in self.floors:
-            result_spot_id = floor.park(vehicle_type, vehicle_number, ticket_id)
-            if  result_spot_id != "" :
-                self.search_manager.index( result_spot_id, vehicle_number, ticket_id)
+        free_floors = self.free_floors.get(vehicle_type)
+        if free_floors is None:
+            return ""
+        while True:
+            with self.floors_lock:
+                if not free_floors:
+                    return ""
+                floor_index = free_floors[0]
+            # The claim itself only holds this floor's lock
+            result_spot_id = self.floors[floor_index].park(vehicle_type, vehicle_number, ticket_id)
+            if result_spot_id != "":
+                self.search_manager.index(result_spot_id, vehicle_number, ticket_id)
                 #print(f"vehicle parked {vehicle_number} in spot {result_spot_id}")
                 return result_spot_id
-        return ""
+            with self.floors_lock:
+                # Recheck under the lock: a remove may have freed a spot since the failed claim,
+                # and then the floor must stay queued
+                if free_floors and free_floors[0] == floor_index \
+                        and self.floors[floor_index].get_free_spots_count(vehicle_type) == 0:
+                    heapq.heappop(free_floors)
+                    self.queued_floors[vehicle_type].discard(floor_index)
 
     def remove_vehicle(self, spot_id: str, vehicle_number: str, ticket_id: str) -> int:
         """
@@ -47,10 +88,157 @@ class Solution:
         if location[0]<0:
             return 404
         floor, row, col = location[0], location[1], location[2]
-        removed= self.floors[floor].remove_vehicle(row, col)
+        if floor >= len(self.floors):
+            return 404
+        parking_floor = self.floors[floor]
+        if row < 0 or row >= parking_floor.rows or col < 0 or col >= parking_floor.columns:
+            return 404
+        release_spot_id = self.helper.get_spot_id(floor, row, col)
+        with parking_floor.lock:
+            removed = parking_floor.free_spot(row * parking_floor.columns + col)
+            # Read the leaving vehicle's search record before another gate can claim the spot,
+            # so the release below cannot close out a vehicle parked there in the meantime
+            entry = self.search_manager.get_parked(release_spot_id) if removed == 201 else None
+        if removed == 201:
+            self._queue_floor(floor, parking_floor.get_vehicle_type(row, col))
+            if entry is not None:
+                self.search_manager.release(release_spot_id, entry)
         #print(f"vehicle {vehicle_number}, {ticket_id} removed from {search_spot_id}")
         return removed
 
+    def park_many(self, requests: list) -> list:
+        """
+        Park a batch of vehicles in order.
+
+        Results match calling park for each request, but the locks are taken once for the
+        whole batch and the free-floor index is walked inline.
+
+        :param requests: (vehicle_type, vehicle_number, ticket_id) tuples.
+        :return: spot_id assigned to each vehicle, "" where no spot was free.
+        """
+        floors = self.floors
+        get_spot_id = self.helper.get_spot_id
+        index = self.search_manager.index_locked
+        thread_safe = self.thread_safe
+        results = []
+        held = self._lock_batch()
+        try:
+            for vehicle_type, vehicle_number, ticket_id in requests:
+                free_floors = self.free_floors.get(vehicle_type)
+                spot_id = ""
+                while free_floors:
+                    floor_index = free_floors[0]
+                    floor = floors[floor_index]
+                    if thread_safe and floor_index not in held:
+                        floor.lock.acquire()
+                        held.add(floor_index)
+                    spot = floor.take_spot(vehicle_type)
+                    if spot >= 0:
+                        row, col = divmod(spot, floor.columns)
+                        spot_id = get_spot_id(floor_index, row, col)
+                        index(spot_id, vehicle_number, ticket_id)
+                        break
+                    heapq.heappop(free_floors)
+                    self.queued_floors[vehicle_type].discard(floor_index)
+                results.append(spot_id)
+        finally:
+            self._unlock_batch(held)
+        return results
+
+    def remove_many(self, requests: list) -> list:
+        """
+        Un-park a batch of vehicles in order.
+
+        Results match calling remove_vehicle for each request, but the locks are taken once for
+        the whole batch and each distinct spot ID is parsed by the helper once.
+
+        :param requests: (spot_id, vehicle_number, ticket_id) tuples.
+        :return: Status code for each request.
+        """
+        floors = self.floors
+        search_manager = self.search_manager
+        thread_safe = self.thread_safe
+        locations = {}
+        results = []
+        held = self._lock_batch()
+        try:
+            for spot_id, vehicle_number, ticket_id in requests:
+                search_spot_id = spot_id if spot_id != "" else search_manager.search_locked(vehicle_number, ticket_id)
+                if search_spot_id == "":
+                    results.append(404)
+                    continue
+                location = locations.get(search_spot_id)
+                if location is None:
+                    location = locations[search_spot_id] = self.helper.get_spot_location(search_spot_id)
+                floor, row, col = location[0], location[1], location[2]
+                if floor < 0 or floor >= len(floors):
+                    results.append(404)
+                    continue
+                parking_floor = floors[floor]
+                if row < 0 or row >= parking_floor.rows or col < 0 or col >= parking_floor.columns:
+                    results.append(404)
+                    continue
+                if thread_safe and floor not in held:
+                    parking_floor.lock.acquire()
+                    held.add(floor)
+                removed = parking_floor.free_spot(row * parking_floor.columns + col)
+                if removed == 201:
+                    self._queue_floor_locked(floor, parking_floor.get_vehicle_type(row, col))
+                    search_manager.release_locked(self.helper.get_spot_id(floor, row, col))
+                results.append(removed)
+        finally:
+            self._unlock_batch(held)
+        return results
+
+    def _lock_batch(self) -> set:
+        """
+        Take the locks a batch needs up front, none unless thread-safe.
+
+        :return: Empty set for the floors whose locks the batch takes as it goes.
+        """
+        for lock in self.batch_locks:
+            lock.acquire()
+        return set()
+
+    def _unlock_batch(self, held: set):
+        """
+        Release the floor locks a batch took and then its up-front locks, in reverse order.
+
+        :param held: Floors whose locks the batch holds.
+        """
+        for floor in held:
+            self.floors[floor].lock.release()
+        for lock in reversed(self.batch_locks):
+            lock.release()
+
+    def _queue_floor(self, floor: int, vehicle_type: int):
+        """
+        Mark a floor as having a free spot for a vehicle type.
+
+        :param floor: Floor number (0-indexed).
+        :param vehicle_type: Type of the vehicle.
+        """
+        with self.floors_lock:
+            self._queue_floor_locked(floor, vehicle_type)
+
+    def _queue_floor_locked(self, floor: int, vehicle_type: int):
+        """
+        Mark a floor as having a free spot for a vehicle type, with floors_lock already held.
+
+        :param floor: Floor number (0-indexed).
+        :param vehicle_type: Type of the vehicle.
+        """
+        queued = self.queued_floors[vehicle_type]
+        if floor not in queued:
+            queued.add(floor)
+            heapq.heappush(self.free_floors[vehicle_type], floor)
+
+    def _new_lock(self):
+        """
+        Real locks only in thread-safe mode; single-threaded callers skip the locking cost.
+        """
+        return threading.Lock() if self.thread_safe else nullcontext()
+
     def get_free_spots_count(self, floor: int, vehicle_type: int) -> int:
         """
         Get the count of free spots for a specific vehicle type on a specific floor.
@@ -75,24 +263,40 @@ class Solution:
         return self.search_manager.search_vehicle(vehicle_number, ticket_id)
 
 class ParkingFloor:
-    def __init__(self, floor: int, parking_floor: list, vehicle_types: list, helper):
+    def __init__(self, floor: int, parking_floor: list, vehicle_types: list, helper, lock=None):
         """
         Initialize a parking floor.
 
+        Spots are numbered row * columns + col. Each spot's vehicle type (0 for no spot) and
+        occupancy live in bytearrays, and the free spots of each vehicle type are the set bits
+        of one integer, so counting them is a popcount and the lowest set bit is the lowest
+        free (row, col). Spot IDs are built by the helper only when a spot is handed out.
+
         :param floor: Floor number.
         :param parking_floor: 2D list representing the parking floor.
         :param vehicle_types: List of vehicle types.
         :param helper: Helper for logging and utility functions.
+        :param lock: Lock guarding this floor's spots, a no-op context when not given.
         """
-        self.parking_spots = [[None for _ in range(len(parking_floor[0]))] for _ in range(len(parking_floor))]
-        self.free_spots_count = {vehicle_type: 0 for vehicle_type in vehicle_types}
-
+        self.floor = floor
+        self.helper = helper
+        self.lock = lock if lock is not None else nullcontext()
+        self.rows = len(parking_floor)
+        self.columns = len(parking_floor[0])
+        size = self.rows * self.columns
+        self.spot_types = bytearray(size)
+        self.occupied = bytearray(size)
+
+        # Bits are collected as a binary string, highest spot first, and converted once
+        bits = {vehicle_type: bytearray(b"0" * size) for vehicle_type in vehicle_types}
         for row in range(len(parking_floor)):
             for col in range(len(parking_floor[row])):
                 if parking_floor[row][col].endswith("1"):
                     vehicle_type = int(parking_floor[row][col].split("-")[0])
-                    self.parking_spots[row][col] = ParkingSpot(helper.get_spot_id(floor, row, col), vehicle_type)
-                    self.free_spots_count[vehicle_type] += 1
+                    index = row * self.columns + col
+                    self.spot_types[index] = vehicle_type
+                    bits[vehicle_type][size - 1 - index] = ord("1")
+        self.free_masks = {vehicle_type: int(bits[vehicle_type] or b"0", 2) for vehicle_type in vehicle_types}
 
     def get_free_spots_count(self, vehicle_type: int) -> int:
         """
@@ -101,7 +305,8 @@ class ParkingFloor:
         :param vehicle_type: Type of the vehicle.
         :return: Count of free spots.
         """
-        return self.free_spots_count.get(vehicle_type, 0)
+        # Lock-free: a writer replaces the whole bitset in one store, so this sees a consistent one
+        return self.free_masks.get(vehicle_type, 0).bit_count()
 
     def remove_vehicle(self, row: int, col: int) -> int:
         """
@@ -111,13 +316,35 @@ class ParkingFloor:
         :param col: Column number.
         :return: Status code indicating the result of the operation.
         """
-        if row < 0 or row >= len(self.parking_spots) or col < 0 or col >= len(self.parking_spots[0]) or not self.parking_spots[row][col].is_parked():
+        if row < 0 or row >= self.rows or col < 0 or col >= self.columns:
             return 404
-        vehicle_type=self.parking_spots[row][col].get_vehicle_type()    
-        self.parking_spots[row][col].remove_vehicle()
-        self.free_spots_count[vehicle_type] += 1
+        with self.lock:
+            return self.free_spot(row * self.columns + col)
+
+    def free_spot(self, index: int) -> int:
+        """
+        Free a spot, with the floor's lock already held.
+
+        :param index: Spot number (row * columns + col).
+        :return: Status code indicating the result of the operation.
+        """
+        if not self.occupied[index]:
+            return 404
+        self.occupied[index] = 0
+        vehicle_type = self.spot_types[index]
+        self.free_masks[vehicle_type] |= 1 << index
         return 201
 
+    def get_vehicle_type(self, row: int, col: int) -> int:
+        """
+        Get the vehicle type of a spot.
+
+        :param row: Row number.
+        :param col: Column number.
+        :return: Vehicle type, or 0 if there is no spot there.
+        """
+        return self.spot_types[row * self.columns + col]
+
     def park(self, vehicle_type: int, vehicle_number: str, ticket_id: str) -> str:
         """
         Assign an empty parking spot to a vehicle.
@@ -125,87 +352,197 @@ class ParkingFloor:
         :param vehicle_type: Type of the vehicle.
         :param vehicle_number: Vehicle number.
         :param ticket_id: Ticket ID.
-        :return: ParkingResult indicating the status of the operation.
+        :return: spot_id assigned to the vehicle, or "" if the floor has no free spot of that type
         """
-        if self.free_spots_count.get(vehicle_type, 0) == 0:
+        index = self.claim_spot(vehicle_type)
+        if index < 0:
             return ""
-        for row in self.parking_spots:
-            for spot in row:
-                if spot is not None and not spot.is_parked() and spot.get_vehicle_type() == vehicle_type:
-                    self.free_spots_count[vehicle_type] -= 1
-                    spot.park_vehicle()
-                    return spot.get_spot_id()
-        return ""
+        row, col = divmod(index, self.columns)
+        return self.helper.get_spot_id(self.floor, row, col)
 
-class ParkingSpot:
-    def __init__(self, spot_id: str, vehicle_type: int):
+    def claim_spot(self, vehicle_type: int) -> int:
         """
-        Initialize a parking spot.
+        Atomically take the lowest free spot of a vehicle type.
 
-        :param spot_id: Spot ID.
         :param vehicle_type: Type of the vehicle.
+        :return: Spot number (row * columns + col), or -1 if there is none.
         """
-        self.spot_id = spot_id
-        self.vehicle_type = vehicle_type
-        self.is_spot_parked = False
+        with self.lock:
+            return self.take_spot(vehicle_type)
 
-    def is_parked(self) -> bool:
+    def take_spot(self, vehicle_type: int) -> int:
         """
-        Check if a vehicle is parked in this spot.
+        Take the lowest free spot of a vehicle type, with the floor's lock already held.
 
-        :return: True if a vehicle is parked, False otherwise.
+        :param vehicle_type: Type of the vehicle.
+        :return: Spot number (row * columns + col), or -1 if there is none.
         """
-        return self.is_spot_parked
+        free_mask = self.free_masks.get(vehicle_type, 0)
+        if not free_mask:
+            return -1
+        lowest = free_mask & -free_mask
+        self.free_masks[vehicle_type] = free_mask ^ lowest
+        index = lowest.bit_length() - 1
+        self.occupied[index] = 1
+        return index
 
-    def park_vehicle(self):
-        """
-        Park a vehicle in this spot.
+class SearchManager:
+    def __init__(self, history_limit: int = None, history_ttl: float = None, clock=time.time, lock=None):
         """
-        self.is_spot_parked = True
+        Initialize the search manager.
 
-    def remove_vehicle(self):
-        """
-        Remove a vehicle from this spot.
+        Vehicle numbers and ticket IDs are indexed separately, so a ticket ID can never shadow
+        a plate. Parked vehicles are always found; once a vehicle leaves, its spot stays
+        searchable until the retention policy drops it.
+
+        :param history_limit: Most past records kept per index, least recently used dropped first.
+        :param history_ttl: Seconds a past record is kept after the vehicle left.
+        :param clock: Returns the current time in seconds, used for exit times.
+        :param lock: Lock guarding the indexes, a no-op context when not given.
         """
-        self.is_spot_parked = False
+        self.vehicles = SpotHistory(history_limit, history_ttl)
+        self.tickets = SpotHistory(history_limit, history_ttl)
+        self.parked = {}  # spot_id -> (vehicle_number, ticket_id) of the vehicle parked there
+        self.clock = clock
+        self.lock = lock if lock is not None else nullcontext()
 
-    def get_spot_id(self) -> str:
+    def search_vehicle(self, vehicle_number: str, ticket_id: str) -> str:
         """
-        Get the spot ID.
+        Search for a vehicle.
 
-        :return: Spot ID.
+        :param vehicle_number: Vehicle number.
+        :param ticket_id: Ticket ID.
+        :return: spot_id of the vehicle, or "" if it is not parked and not in the history.
         """
-        return self.spot_id
+        with self.lock:
+            return self.search_locked(vehicle_number, ticket_id)
 
-    def get_vehicle_type(self) -> int:
+    def search_locked(self, vehicle_number: str, ticket_id: str) -> str:
         """
-        Get the vehicle type.
+        Search for a vehicle, with the search lock already held.
 
-        :return: Vehicle type.
+        :param vehicle_number: Vehicle number.
+        :param ticket_id: Ticket ID.
+        :return: spot_id of the vehicle, or "" if it is not parked and not in the history.
         """
-        return self.vehicle_type
+        if vehicle_number.strip():
+            return self.vehicles.get(vehicle_number, self.clock())
+        if ticket_id.strip():
+            return self.tickets.get(ticket_id, self.clock())
+        return ""
 
-class SearchManager:
-    def __init__(self):
+    def index(self, spot_id: str, vehicle_number: str, ticket_id: str):
         """
-        Initialize the search manager.
+        Record a vehicle as parked at a spot.
+
+        :param spot_id: Spot ID the vehicle was given.
+        :param vehicle_number: Vehicle number.
+        :param ticket_id: Ticket ID.
         """
-        self.cache = {}
+        with self.lock:
+            self.index_locked(spot_id, vehicle_number, ticket_id)
 
-    def search_vehicle(self, vehicle_number: str, ticket_id: str) -> str:
+    def index_locked(self, spot_id: str, vehicle_number: str, ticket_id: str):
         """
-        Search for a vehicle.
+        Record a vehicle as parked at a spot, with the search lock already held.
 
+        :param spot_id: Spot ID the vehicle was given.
         :param vehicle_number: Vehicle number.
         :param ticket_id: Ticket ID.
-        :return: ParkingResult indicating the result of the search.
         """
-        if vehicle_number.strip():
-            return self.cache.get(vehicle_number)
-        if ticket_id.strip():
-            return self.cache.get(ticket_id)
-        return ""
+        if spot_id in self.parked:
+            # The spot was freed by an ID release() did not see, close out the old vehicle
+            self.release_locked(spot_id)
+        self.parked[spot_id] = (vehicle_number, ticket_id)
+        self.vehicles.park(vehicle_number, spot_id)
+        self.tickets.park(ticket_id, spot_id)
+
+    def get_parked(self, spot_id: str):
+        """
+        Read a spot's parked record without the lock.
+
+        :param spot_id: Spot ID.
+        :return: (vehicle_number, ticket_id) record of the vehicle indexed there, or None.
+        """
+        return self.parked.get(spot_id)
+
+    def release(self, spot_id: str, entry: tuple = None):
+        """
+        Move the vehicle parked at a spot into the history.
 
-    def index(self, spot_id, vehicle_number, ticket_id):
-        self.cache[vehicle_number] = spot_id
-        self.cache[ticket_id] = spot_id
\ No newline at end of file
+        :param spot_id: Spot ID the vehicle left.
+        :param entry: Record from get_parked taken when the spot was freed. If the spot has been
+            indexed for another vehicle since, that vehicle stays parked. None releases whatever
+            vehicle is indexed there.
+        """
+        with self.lock:
+            self.release_locked(spot_id, entry)
+
+    def release_locked(self, spot_id: str, entry: tuple = None):
+        """
+        Move the vehicle parked at a spot into the history, with the search lock already held.
+
+        :param spot_id: Spot ID the vehicle left.
+        :param entry: Record from get_parked taken when the spot was freed, see release.
+        """
+        current = self.parked.get(spot_id)
+        if current is None or (entry is not None and current is not entry):
+            return
+        del self.parked[spot_id]
+        now = self.clock()
+        self.vehicles.leave(current[0], spot_id, now)
+        self.tickets.leave(current[1], spot_id, now)
+
+class SpotHistory:
+    def __init__(self, limit: int = None, ttl: float = None):
+        """
+        Spot IDs by key for vehicles that are parked, plus a bounded record of where
+        vehicles that left were parked.
+
+        :param limit: Most past records kept, least recently used dropped first.
+        :param ttl: Seconds a past record is kept after its exit time.
+        """
+        self.limit = limit
+        self.ttl = ttl
+        self.active = {}  # key -> spot_id
+        self.exited = OrderedDict()  # key -> (spot_id, exit_time), least recently used first
+
+    def __len__(self) -> int:
+        return len(self.active) + len(self.exited)
+
+    def park(self, key: str, spot_id: str):
+        self.exited.pop(key, None)
+        self.active[key] = spot_id
+
+    def leave(self, key: str, spot_id: str, now: float):
+        # A key that has since been parked elsewhere stays active
+        if self.active.get(key) != spot_id:
+            return
+        del self.active[key]
+        self.exited[key] = (spot_id, now)
+        self._evict(now)
+
+    def get(self, key: str, now: float) -> str:
+        spot_id = self.active.get(key)
+        if spot_id is not None:
+            return spot_id
+        entry = self.exited.get(key)
+        if entry is None:
+            return ""
+        if self.ttl is not None and entry[1] <= now - self.ttl:
+            del self.exited[key]
+            return ""
+        self.exited.move_to_end(key)
+        return entry[0]
+
+    def _evict(self, now: float):
+        exited = self.exited
+        if self.limit is not None:
+            while len(exited) > self.limit:
+                exited.popitem(last=False)
+        if self.ttl is not None:
+            # Records are mostly in exit order; one moved back by a lookup is dropped by get()
+            # once expired, or here when it reaches the front
+            cutoff = now - self.ttl
+            while exited and next(iter(exited.values()))[1] <= cutoff:
+                exited.popitem(last=False)
@@ -0,0 +1,252 @@
+import argparse
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+from parking_lot import SearchManager, Solution
+
+
+class Helper:
+    def get_spot_id(self, floor, row, col):
+        return f"{floor}-{row}-{col}"
+
+    def get_spot_location(self, spot_id):
+        try:
+            floor, row, col = map(int, spot_id.split('-'))
+            return floor, row, col
+        except ValueError:
+            return -1, -1, -1
+
+
+# floors x rows x cols structure, every spot active, a mix of 2- and 4-wheeler spots
+def build_structure(num_floors: int, rows: int, cols: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [[[f"{rng.choice((2, 4, 4))}-1" for _ in range(cols)] for _ in range(rows)] for _ in range(num_floors)]
+
+
+def build_solution(num_floors: int, rows: int, cols: int, seed: int, thread_safe: bool = False,
+                   history_limit: int = None) -> Solution:
+    solution = Solution()
+    solution.init(Helper(), build_structure(num_floors, rows, cols, seed), thread_safe, history_limit)
+    return solution
+
+
+def bench_park(num_floors: int, rows: int, cols: int, occupancy: float, num_events: int, seed: int):
+    # Fill the lot to the given occupancy, then time a churn of random exits and arrivals
+    rng = random.Random(seed)
+    solution = build_solution(num_floors, rows, cols, seed)
+    total = num_floors * rows * cols
+    parked = []
+    started = time.perf_counter()
+    for i in range(int(total * occupancy)):
+        vehicle_type = rng.choice((2, 4))
+        spot_id = solution.park(vehicle_type, f"V{i}", f"T{i}")
+        if spot_id:
+            parked.append((spot_id, f"V{i}", f"T{i}"))
+    fill_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(num_events):
+        if parked and i % 2 == 0:
+            spot_id, vehicle_number, ticket_id = parked.pop(rng.randrange(len(parked)))
+            solution.remove_vehicle(spot_id, vehicle_number, ticket_id)
+        else:
+            spot_id = solution.park(rng.choice((2, 4)), f"C{i}", f"CT{i}")
+            if spot_id:
+                parked.append((spot_id, f"C{i}", f"CT{i}"))
+    churn_seconds = time.perf_counter() - started
+
+    print(f"{num_floors} floors x {rows * cols:,} spots, filled {len(parked):,} in {fill_seconds:.2f}s "
+          f"({len(parked) / fill_seconds:,.0f} parks/s)")
+    print(f"churn at {occupancy:.0%} occupancy: {num_events / churn_seconds:,.0f} events/s "
+          f"({churn_seconds / num_events * 1e6:.1f}us per park/remove)")
+
+
+def bench_memory(num_floors: int, rows: int, cols: int, seed: int):
+    # Heap held by the lot itself, the input structure is built before tracing starts
+    structure = build_structure(num_floors, rows, cols, seed)
+    tracemalloc.start()
+    started = time.perf_counter()
+    solution = Solution()
+    solution.init(Helper(), structure)
+    init_seconds = time.perf_counter() - started
+    lot_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    total = num_floors * rows * cols
+    free_fours = sum(solution.get_free_spots_count(floor, 4) for floor in range(num_floors))
+    print(f"{num_floors} floors x {rows * cols:,} spots: {lot_bytes / 1e6:.2f} MB "
+          f"({lot_bytes / total:.1f} bytes/spot), init {init_seconds:.2f}s under tracing, "
+          f"{free_fours:,} free 4-wheeler spots")
+
+
+def bench_stress(num_gates: int, num_floors: int, rows: int, cols: int, ops_per_gate: int, seed: int):
+    # A small lot so gates keep filling floors up and fighting over the last spots, and a short
+    # search history so a parked vehicle wrongly moved into it is soon evicted and goes missing
+    solution = build_solution(num_floors, rows, cols, seed, thread_safe=True, history_limit=num_gates)
+    capacity = {(floor, vehicle_type): solution.get_free_spots_count(floor, vehicle_type)
+                for floor in range(num_floors) for vehicle_type in (2, 4)}
+    # Switch threads as often as possible to shake out races
+    sys.setswitchinterval(1e-6)
+
+    held = {}  # spot_id -> (vehicle_number, ticket_id) some gate currently holds, under check_lock
+    check_lock = threading.Lock()
+    failures = []
+
+    # Phase 1: random parks and removes of the gate's own vehicles, while a reader polls counts
+    def mixed(gate: int):
+        # Even gates make single calls, odd gates flush batches of up to 8 events
+        rng = random.Random(seed + gate)
+        own = []
+        i = 0
+        while i < ops_per_gate:
+            size = 1 if gate % 2 == 0 else min(rng.randint(1, 8), ops_per_gate - i)
+            if own and rng.random() < 0.45:
+                leaving = [own.pop(rng.randrange(len(own))) for _ in range(min(size, len(own)))]
+                with check_lock:
+                    for spot_id, _, _ in leaving:
+                        del held[spot_id]
+                if gate % 2 == 0:
+                    statuses = [solution.remove_vehicle(*vehicle) for vehicle in leaving]
+                else:
+                    statuses = solution.remove_many(leaving)
+                for (spot_id, _, _), status in zip(leaving, statuses):
+                    if status != 201:
+                        failures.append(f"gate {gate} could not remove its vehicle from {spot_id}: {status}")
+                i += len(leaving)
+                continue
+            arriving = [(rng.choice((2, 4)), f"G{gate}-V{i + j}", f"G{gate}-T{i + j}") for j in range(size)]
+            if gate % 2 == 0:
+                spot_ids = [solution.park(*vehicle) for vehicle in arriving]
+            else:
+                spot_ids = solution.park_many(arriving)
+            for spot_id, (_, vehicle_number, ticket_id) in zip(spot_ids, arriving):
+                if spot_id:
+                    with check_lock:
+                        if spot_id in held:
+                            failures.append(f"spot {spot_id} handed to two vehicles")
+                        held[spot_id] = (vehicle_number, ticket_id)
+                    own.append((spot_id, vehicle_number, ticket_id))
+            i += size
+
+    stop = threading.Event()
+
+    def read_counts():
+        while not stop.is_set():
+            for (floor, vehicle_type), total in capacity.items():
+                if not 0 <= solution.get_free_spots_count(floor, vehicle_type) <= total:
+                    failures.append(f"free count out of range on floor {floor}")
+
+    # Phase 2: the lot is full and every gate tries to remove the same vehicle at once
+    barrier = threading.Barrier(num_gates)
+    hot_results = []
+
+    def race(gate: int):
+        barrier.wait()
+        hot_results.append(solution.remove_vehicle(hot_spot, "HOT", "HOT-T"))
+
+    for phase in (mixed, race):
+        if phase is race:
+            filled = []
+            for vehicle_type in (2, 4):
+                while spot_id := solution.park(vehicle_type, "FILL", "FILL-T"):
+                    filled.append(spot_id)
+            hot_spot = (filled or sorted(held))[0]
+        threads = [threading.Thread(target=phase, args=(i,)) for i in range(num_gates)]
+        reader = threading.Thread(target=read_counts)
+        started = time.perf_counter()
+        reader.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stop.set()
+        reader.join()
+        stop.clear()
+        elapsed = time.perf_counter() - started
+        total_ops = num_gates * (ops_per_gate if phase is mixed else 1)
+        print(f"{phase.__name__}: {num_gates} gates, {total_ops:,} ops in {elapsed:.2f}s "
+              f"({total_ops / elapsed:,.0f} ops/s)")
+
+        if phase is mixed:
+            # Every spot is either free or held by exactly one gate
+            free = sum(solution.get_free_spots_count(floor, vehicle_type) for floor, vehicle_type in capacity)
+            if free + len(held) != sum(capacity.values()):
+                failures.append(f"{free} free + {len(held)} held != {sum(capacity.values())} spots")
+            # and no floor with a free spot has dropped out of the free-floor index
+            for floor, vehicle_type in capacity:
+                if solution.get_free_spots_count(floor, vehicle_type) and floor not in solution.queued_floors[vehicle_type]:
+                    failures.append(f"floor {floor} has free {vehicle_type}-wheeler spots but is not queued")
+            # and every held vehicle is still found at its spot by plate and by ticket
+            for spot_id, (vehicle_number, ticket_id) in held.items():
+                if solution.search_vehicle(vehicle_number, "") != spot_id \
+                        or solution.search_vehicle("", ticket_id) != spot_id:
+                    failures.append(f"{vehicle_number} parked at {spot_id} is not searchable")
+
+    if hot_results.count(201) != 1:
+        failures.append(f"hot spot removed {hot_results.count(201)} times")
+    assert not failures, "\n".join(failures[:10])
+    print("invariants ok: no spot handed out twice, free + held = capacity, held vehicles searchable, "
+          "one winner per removal race")
+
+
+def bench_history(vehicles_per_day: int, days: int, regulars: int, seed: int):
+    # Search index memory over simulated traffic: every visit gets a new ticket, most plates
+    # come back, and each visit leaves the same day. The clock is simulated, in seconds
+    policies = [("unbounded", None, None), ("ttl 30 days", None, 30 * 86400),
+                ("lru 100k", 100_000, None)]
+    checkpoints = {30, 91, 182, days}
+    for name, limit, ttl in policies:
+        rng = random.Random(seed)
+        now = [0.0]
+        search_manager = SearchManager(limit, ttl, clock=lambda: now[0])
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        samples = []
+        visit = 0
+        for day in range(1, days + 1):
+            for i in range(vehicles_per_day):
+                now[0] = (day - 1) * 86400 + i * 86400 / vehicles_per_day
+                plate = f"P{rng.randrange(regulars)}" if rng.random() < 0.7 else f"V{visit}"
+                spot_id = f"{i % 50}-{i // 50 % 40}-{i % 37}"
+                search_manager.index(spot_id, plate, f"T{visit}")
+                search_manager.release(spot_id)
+                visit += 1
+            if day in checkpoints:
+                samples.append(f"day {day}: {(tracemalloc.get_traced_memory()[0] - baseline) / 1e6:.1f} MB")
+        elapsed = time.perf_counter() - started
+        tracemalloc.stop()
+        found = search_manager.search_vehicle("", f"T{visit - 1}") != ""
+        print(f"{name}: {', '.join(samples)}; {len(search_manager.vehicles):,} plates and "
+              f"{len(search_manager.tickets):,} tickets kept, last ticket found: {found} ({elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parking lot benchmarks")
+    parser.add_argument("--floors", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=40)
+    parser.add_argument("--cols", type=int, default=50)
+    parser.add_argument("--occupancy", type=float, default=0.9)
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--memory", action="store_true", help="measure heap held by the parking structure")
+    parser.add_argument("--stress", type=int, default=0,
+                        help="run this many concurrent gates against a small thread-safe lot (e.g. 64)")
+    parser.add_argument("--ops-per-gate", type=int, default=2_000)
+    parser.add_argument("--history", type=int, default=0,
+                        help="simulate a year of search history at this many vehicles per day (e.g. 10000)")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--regulars", type=int, default=50_000, help="plates that keep coming back")
+    args = parser.parse_args()
+
+    if args.history:
+        bench_history(args.history, args.days, args.regulars, args.seed)
+    elif args.stress:
+        bench_stress(args.stress, 4, 8, 8, args.ops_per_gate, args.seed)
+    elif args.memory:
+        bench_memory(args.floors, args.rows, args.cols, args.seed)
+    else:
+        bench_park(args.floors, args.rows, args.cols, args.occupancy, args.events, args.seed)
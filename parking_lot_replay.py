@@ -0,0 +1,131 @@
+import argparse
+import json
+import random
+import time
+
+from parking_lot import Solution
+from parking_lot_benchmark import Helper, build_structure
+
+
+# Event files are JSONL: a header line {"parking": structure}, then one event per line,
+# {"op": "park", "type": 4, "vehicle": ..., "ticket": ...} or
+# {"op": "remove", "spot": ..., "vehicle": ..., "ticket": ...} with spot "" for a lookup
+def record_events(path: str, num_events: int, num_floors: int, rows: int, cols: int, seed: int):
+    # Gate traffic against a live lot so removals name real spots: arrivals and exits at about
+    # 90% occupancy, exits found by spot, plate or ticket
+    rng = random.Random(seed)
+    parking = build_structure(num_floors, rows, cols, seed)
+    solution = Solution()
+    solution.init(Helper(), parking)
+    target = int(num_floors * rows * cols * 0.9)
+    parked = []
+    with open(path, "w") as f:
+        f.write(json.dumps({"parking": parking}) + "\n")
+        for i in range(num_events):
+            if parked and (len(parked) >= target or rng.random() < 0.3):
+                spot_id, vehicle_number, ticket_id = parked.pop(rng.randrange(len(parked)))
+                lookup = rng.random()
+                if lookup < 0.7:
+                    event = {"op": "remove", "spot": spot_id, "vehicle": vehicle_number, "ticket": ticket_id}
+                elif lookup < 0.9:
+                    event = {"op": "remove", "spot": "", "vehicle": vehicle_number, "ticket": ""}
+                else:
+                    event = {"op": "remove", "spot": "", "vehicle": "", "ticket": ticket_id}
+                solution.remove_vehicle(event["spot"], event["vehicle"], event["ticket"])
+            else:
+                event = {"op": "park", "type": rng.choice((2, 4, 4)), "vehicle": f"KA{i:08d}", "ticket": f"T{i}"}
+                spot_id = solution.park(event["type"], event["vehicle"], event["ticket"])
+                if spot_id:
+                    parked.append((spot_id, event["vehicle"], event["ticket"]))
+            f.write(json.dumps(event) + "\n")
+
+
+def load_events(path: str):
+    with open(path) as f:
+        parking = json.loads(f.readline())["parking"]
+        events = []
+        for line in f:
+            event = json.loads(line)
+            if event["op"] == "park":
+                events.append(("park", (event["type"], event["vehicle"], event["ticket"])))
+            else:
+                events.append(("remove", (event["spot"], event["vehicle"], event["ticket"])))
+    return parking, events
+
+
+def _percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def replay_per_call(solution: Solution, events: list):
+    # One call per event; each event's latency is its own call
+    results = []
+    latencies = []
+    clock = time.perf_counter
+    for op, args in events:
+        started = clock()
+        results.append(solution.park(*args) if op == "park" else solution.remove_vehicle(*args))
+        latencies.append(clock() - started)
+    return results, latencies
+
+
+def replay_batched(solution: Solution, events: list, batch_size: int):
+    # Events are flushed batch_size at a time, each flush split into runs of the same op.
+    # An event's latency is its whole flush, since the gate waits for the flush to finish
+    results = []
+    latencies = []
+    clock = time.perf_counter
+    for start in range(0, len(events), batch_size):
+        flush = events[start:start + batch_size]
+        started = clock()
+        run_start = 0
+        for i in range(1, len(flush) + 1):
+            if i == len(flush) or flush[i][0] != flush[run_start][0]:
+                run = [args for _, args in flush[run_start:i]]
+                if flush[run_start][0] == "park":
+                    results.extend(solution.park_many(run))
+                else:
+                    results.extend(solution.remove_many(run))
+                run_start = i
+        latencies.extend([clock() - started] * len(flush))
+    return results, latencies
+
+
+def replay(path: str, batch_size: int, thread_safe: bool):
+    parking, events = load_events(path)
+    outcomes = {}
+    for mode in ("per-call", "batched"):
+        solution = Solution()
+        solution.init(Helper(), parking, thread_safe)
+        started = time.perf_counter()
+        if mode == "per-call":
+            results, latencies = replay_per_call(solution, events)
+        else:
+            results, latencies = replay_batched(solution, events, batch_size)
+        elapsed = time.perf_counter() - started
+        outcomes[mode] = (results, elapsed)
+        label = mode if mode == "per-call" else f"batched x{batch_size}"
+        print(f"{label}: {len(events):,} events in {elapsed:.2f}s ({len(events) / elapsed:,.0f} events/s), "
+              f"latency p50 {_percentile(latencies, 0.5) * 1e6:.1f}us, p99 {_percentile(latencies, 0.99) * 1e6:.1f}us")
+
+    assert outcomes["per-call"][0] == outcomes["batched"][0], "batched results differ from per-call results"
+    print(f"results identical, batched speedup {outcomes['per-call'][1] / outcomes['batched'][1]:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record and replay parking gate events")
+    parser.add_argument("path", help="event file (JSONL)")
+    parser.add_argument("--record", type=int, default=0, help="write this many events to path instead of replaying")
+    parser.add_argument("--floors", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=40)
+    parser.add_argument("--cols", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=256, help="events per gate controller flush")
+    parser.add_argument("--thread-safe", action="store_true", help="replay against a thread-safe lot")
+    args = parser.parse_args()
+
+    if args.record:
+        record_events(args.path, args.record, args.floors, args.rows, args.cols, args.seed)
+    else:
+        replay(args.path, args.batch_size, args.thread_safe)
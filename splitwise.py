@@ -1,8 +1,68 @@
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from decimal import Decimal, ROUND_HALF_UP
+import bisect
+import heapq
+import json
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+
+try:
+    import numpy as np
+except ImportError:  # Optional, only VectorBalanceEngine needs it
+    np = None
+
+
+CENTS = Decimal("0.01")
+ONE = Decimal(1)
+
+
+# Money enters as Decimal/str/int and is held as integer cents from then on
+def to_cents(amount):
+    if type(amount) is int:
+        return amount * 100
+    if type(amount) is str:
+        # Plain "123.45" strings are read as integers, anything else goes through Decimal
+        whole, _, fraction = amount.strip().partition(".")
+        if len(fraction) <= 2 and (whole + fraction).lstrip("+-").isdigit():
+            try:
+                return int(whole + fraction.ljust(2, "0"))
+            except ValueError:
+                pass
+    return int(Decimal(str(amount)).scaleb(2).quantize(ONE, rounding=ROUND_HALF_UP))
+
+
+# Integer cents back to a two-place Decimal for display
+def format_cents(cents):
+    return Decimal(cents).scaleb(-2).quantize(CENTS)
+
+
+# Split total_cents in proportion to integer weights. Every share is floored first and the
+# leftover cents go to the largest remainders, earlier entries first on ties, so the shares
+# always add up to the total and the result is deterministic.
+def allocate_cents(total_cents, weights):
+    total_weight = sum(weights)
+    shares = []
+    remainders = []
+    for weight in weights:
+        share, remainder = divmod(total_cents * weight, total_weight)
+        shares.append(share)
+        remainders.append(remainder)
+    leftover = total_cents - sum(shares)
+    if leftover:
+        for index in sorted(range(len(weights)), key=lambda i: -remainders[i])[:leftover]:
+            shares[index] += 1
+    return shares
 
 
 class User:
+    # Slots keep attributes in the object instead of a per-user dict, 64 bytes a user not 104
+    __slots__ = ("user_id", "name", "email", "phone")
+
     def __init__(self, user_id, name, email, phone):
         self.user_id = user_id
         self.name = name
@@ -19,10 +79,13 @@ class User:
 class UserManager:
     def __init__(self):
         self.users = {}
+        # Bumped whenever a user is added or replaced, so cached report text can tell names changed
+        self.version = 0
         
     def add_user(self, user_id, name, email, phone):
         user = User(user_id, name, email, phone)
         self.users[user_id] = user
+        self.version += 1
 
     def get_user(self, user_id):
         return self.users.get(user_id)
@@ -31,155 +94,1046 @@ class UserManager:
         return self.users.values()
 
 
+class BalanceIndex:
+    # (net cents, user_id) keys in sorted order. Keys live in sorted buckets of bounded size,
+    # so an update shifts one small list and top-N reads walk in from either end.
+    BUCKET_SIZE = 512
+
+    def __init__(self):
+        self._buckets = []
+        self._maxes = []  # Last key of each bucket
+
+    def load(self, keys):
+        # Replaces the contents with keys in one sort, much cheaper than adding them one by one
+        keys = sorted(keys)
+        self._buckets = [keys[start:start + self.BUCKET_SIZE] for start in range(0, len(keys), self.BUCKET_SIZE)]
+        self._maxes = [bucket[-1] for bucket in self._buckets]
+
+    def add(self, key):
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+            return
+        index = min(bisect.bisect_left(self._maxes, key), len(self._buckets) - 1)
+        bucket = self._buckets[index]
+        bisect.insort(bucket, key)
+        self._maxes[index] = bucket[-1]
+        if len(bucket) > 2 * self.BUCKET_SIZE:
+            half = len(bucket) // 2
+            self._buckets[index:index + 1] = [bucket[:half], bucket[half:]]
+            self._maxes[index:index + 1] = [bucket[half - 1], bucket[-1]]
+
+    def remove(self, key):
+        index = bisect.bisect_left(self._maxes, key)
+        bucket = self._buckets[index]
+        del bucket[bisect.bisect_left(bucket, key)]
+        if bucket:
+            self._maxes[index] = bucket[-1]
+        else:
+            del self._buckets[index]
+            del self._maxes[index]
+
+    def smallest(self):
+        for bucket in self._buckets:
+            yield from bucket
+
+    def largest(self):
+        for bucket in reversed(self._buckets):
+            yield from reversed(bucket)
+
+
 class TransactionManager:
-    def __init__(self, users):
-        self.transactions = {
-            user.get_id(): {other.get_id(): Decimal('0.00') for other in users}
-            for user in users
-        }
+    # Sparse ledger of integer cents, only non-zero pairwise balances are stored.
+    # transactions[a][b] > 0 means b owes a, and transactions[b][a] holds the negated amount.
+    # Users need no registration here, so they can be added at any time.
+    def __init__(self):
+        self.transactions = {}
+        # Net cents per user, kept in step with every adjustment. Positive means owed money
+        self.net_balances = {}
+        # Adjustment counters, overall and per user, so caches can tell what changed
+        self.version = 0
+        self.versions = {}
+        # Users whose net changed since the balance index was last brought up to date.
+        # Ranking queries fold them in, so adjustments stay O(1)
+        self._dirty = set()
+        self._indexed = {}  # user_id -> net as currently held in the index
+        self._index = BalanceIndex()
 
     def adjust_transaction(self, payer_id, user_id, amount):
-        self.transactions[user_id][payer_id] -= amount
-        self.transactions[payer_id][user_id] += amount
+        if payer_id == user_id or not amount:
+            return
+        net_balances = self.net_balances
+        net = net_balances.get(payer_id, 0) + amount
+        if net:
+            net_balances[payer_id] = net
+        else:
+            del net_balances[payer_id]
+        net = net_balances.get(user_id, 0) - amount
+        if net:
+            net_balances[user_id] = net
+        else:
+            del net_balances[user_id]
+        self._dirty.add(payer_id)
+        self._dirty.add(user_id)
+        versions = self.versions
+        versions[payer_id] = versions.get(payer_id, 0) + 1
+        versions[user_id] = versions.get(user_id, 0) + 1
+        self.version += 1
+
+        payer_balances = self.transactions.setdefault(payer_id, {})
+        user_balances = self.transactions.setdefault(user_id, {})
+        balance = payer_balances.get(user_id, 0) + amount
+        if balance:
+            payer_balances[user_id] = balance
+            user_balances[payer_id] = -balance
+            return
+        # Settled pairs are dropped so memory follows the outstanding debts
+        del payer_balances[user_id]
+        del user_balances[payer_id]
+        if not payer_balances:
+            del self.transactions[payer_id]
+        if not user_balances:
+            del self.transactions[user_id]
+
+    def restore(self, rows, net_balances):
+        # Loads an empty ledger from ExpenseProcessor.to_snapshot output. Rows and net balances
+        # keep their saved order, so SHOW and SETTLE output match the ledger that was saved
+        versions = self.versions
+        for user_id, row in rows:
+            self.transactions[user_id] = dict(row)
+            versions[user_id] = versions.get(user_id, 0) + 1
+        for user_id, net in net_balances:
+            self.net_balances[user_id] = net
+            self._dirty.add(user_id)
+        self.version += 1
 
     def get_balances(self, user_id=None):
         if user_id:
-            return self.transactions[user_id]
+            return self.transactions.get(user_id, {})
         return self.transactions
 
+    def get_net_balance(self, user_id):
+        return self.net_balances.get(user_id, 0)
+
+    def get_net_balances(self):
+        # Net position per user, positive means the user is owed money overall
+        return dict(self.net_balances)
+
+    def _refresh_index(self):
+        if len(self._dirty) > len(self._indexed):
+            # Most of the index would change anyway, rebuild it from the net balances
+            self._index.load((net, user_id) for user_id, net in self.net_balances.items())
+            self._indexed = dict(self.net_balances)
+            self._dirty.clear()
+            return
+        for user_id in self._dirty:
+            old = self._indexed.pop(user_id, 0)
+            if old:
+                self._index.remove((old, user_id))
+            net = self.net_balances.get(user_id, 0)
+            if net:
+                self._index.add((net, user_id))
+                self._indexed[user_id] = net
+        self._dirty.clear()
+
+    def top_creditors(self, limit):
+        # Up to limit (user_id, cents) pairs for the users owed the most, largest first
+        self._refresh_index()
+        top = []
+        for net, user_id in self._index.largest():
+            if net <= 0 or len(top) == limit:
+                break
+            top.append((user_id, net))
+        return top
+
+    def top_debtors(self, limit):
+        # Up to limit (user_id, cents) pairs for the users who owe the most, largest debt first
+        self._refresh_index()
+        top = []
+        for net, user_id in self._index.smallest():
+            if net >= 0 or len(top) == limit:
+                break
+            top.append((user_id, -net))
+        return top
+
+    def simplify(self):
+        # Settle-up plan as (debtor_id, creditor_id, cents) transfers. The largest debtor pays
+        # the largest creditor until one of them is cleared, so every transfer settles at least
+        # one user: at most N - 1 transfers in O(N log N). A true minimum is NP-hard.
+        net_balances = self.get_net_balances()
+        user_ids = list(net_balances)
+        count = len(user_ids)
+
+        # Heap entries are plain ints, -(cents * count + rank) with rank = count - 1 - index, so
+        # the max-heaps compare ints instead of tuples; on equal cents the higher rank pops
+        # first, so ties go to the lower index
+        creditors = []
+        debtors = []
+        for index, cents in enumerate(net_balances.values()):
+            if cents > 0:
+                creditors.append(-(cents * count + count - 1 - index))
+            elif cents < 0:
+                debtors.append(cents * count - (count - 1 - index))
+        heapq.heapify(creditors)
+        heapq.heapify(debtors)
+
+        plan = []
+        while creditors and debtors:
+            credit, creditor = divmod(-heapq.heappop(creditors), count)
+            debt, debtor = divmod(-heapq.heappop(debtors), count)
+            amount = min(credit, debt)
+            plan.append((user_ids[count - 1 - debtor], user_ids[count - 1 - creditor], amount))
+            if credit > amount:
+                heapq.heappush(creditors, -((credit - amount) * count + creditor))
+            if debt > amount:
+                heapq.heappush(debtors, -((debt - amount) * count + debtor))
+        return plan
+
 
 class Split(ABC):
+    # amount is in integer cents, details are the raw values from the caller
     @abstractmethod
-    def perform_split(self, amount, users, payer, details, transaction_manager):
+    def get_shares(self, amount, users, details):
+        # Cents owed by each of users, in the same order
         pass
 
+    def perform_split(self, amount, users, payer, details, transaction_manager):
+        self._apply_shares(users, payer, self.get_shares(amount, users, details), transaction_manager)
+
+    @staticmethod
+    def _apply_shares(users, payer, shares, transaction_manager):
+        payer_id = payer.get_id()
+        adjust_transaction = transaction_manager.adjust_transaction
+        for user, share in zip(users, shares):
+            if user is not payer:
+                adjust_transaction(payer_id, user.user_id, share)
+
 
 class EqualSplit(Split):
-    def perform_split(self, amount, users, payer, details, transaction_manager):
-        split_amount = (Decimal(amount) / len(users)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        for user in users:
-            if user != payer:
-                transaction_manager.adjust_transaction(payer.get_id(), user.get_id(), split_amount)
+    def get_shares(self, amount, users, details):
+        share, leftover = divmod(amount, len(users))
+        return [share + 1 if index < leftover else share for index in range(len(users))]
 
 
 class PercentSplit(Split):
-    def perform_split(self, amount, users, payer, percentages, transaction_manager):
-        percentages = [Decimal(str(amount)) for amount in percentages]
-        if sum(percentages) != 100:
+    def get_shares(self, amount, users, percentages):
+        weights, scale = self._weights(percentages)
+        if sum(weights) != 100 * scale:
             raise ValueError("Percentages must add up to 100.")
-        for user, percentage in zip(users, percentages):
-            if user != payer:
-                split_amount = (Decimal(amount) * (Decimal(percentage) / 100)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-                transaction_manager.adjust_transaction(payer.get_id(), user.get_id(), split_amount)
+        return allocate_cents(amount, weights)
+
+    @staticmethod
+    def _weights(percentages):
+        # Percentages as integers on a common scale, so "33.33" style values stay exact.
+        # Whole percentages are the common case and skip Decimal entirely.
+        try:
+            return [int(str(percentage)) for percentage in percentages], 1
+        except ValueError:
+            pass
+        percentages = [Decimal(str(percentage)) for percentage in percentages]
+        scale = 10 ** max(max(-percentage.as_tuple().exponent for percentage in percentages), 0)
+        return [int(percentage * scale) for percentage in percentages], scale
 
 
 class ExactSplit(Split):
-    def perform_split(self, amount, users, payer, exact_amounts, transaction_manager):
-        # Convert exact amounts to Decimals
-        exact_amounts = [Decimal(str(amount)) for amount in exact_amounts]
-        
-        if sum(exact_amounts) != Decimal(str(amount)):
+    def get_shares(self, amount, users, exact_amounts):
+        exact_amounts = [to_cents(exact_amount) for exact_amount in exact_amounts]
+
+        if sum(exact_amounts) != amount:
             raise ValueError("Exact amounts must sum to the total amount.")
-        
-        for user, exact_amount in zip(users, exact_amounts):
-            if user != payer:
-                split_amount = exact_amount.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-                transaction_manager.adjust_transaction(payer.get_id(), user.get_id(), split_amount)
+
+        return exact_amounts
 
 
 class SplitFactory:
+    # Splits keep no state, so one instance of each is shared by every expense
+    _splits = {
+        'EQUAL': EqualSplit(),
+        'PERCENT': PercentSplit(),
+        'EXACT': ExactSplit(),
+    }
+
     @staticmethod
     def get_split(expense_type):
-        if expense_type == 'EQUAL':
-            return EqualSplit()
-        elif expense_type == 'PERCENT':
-            return PercentSplit()
-        elif expense_type == 'EXACT':
-            return ExactSplit()
-        else:
+        split = SplitFactory._splits.get(expense_type)
+        if split is None:
             raise ValueError("Invalid expense type")
+        return split
+
+
+# "EXPENSE <payer> <amount> <n> <n user ids> <TYPE> [details...]" into the add_expense fields
+def parse_expense_command(command):
+    parts = command.split()
+    if len(parts) < 5 or parts[0] != "EXPENSE":
+        raise ValueError("Not an EXPENSE command")
+    payer_id = parts[1]
+    amount = parts[2]
+    num_users = int(parts[3])
+    if len(parts) < 5 + num_users:
+        raise ValueError("Missing users or expense type")
+    user_ids = parts[4:4 + num_users]
+    expense_type = parts[4 + num_users]
+    details = parts[5 + num_users:] if len(parts) > 5 + num_users else None
+    return expense_type, amount, user_ids, payer_id, details
+
+
+# Bulk ingestion is a generator pipeline: read_expense_log -> parse_expense_log ->
+# ExpenseProcessor.validate_expenses -> ExpenseProcessor.apply_expenses. Each line is
+# handled and dropped before the next is read, so memory stays flat for any log size.
+def read_expense_log(path):
+    # Yields (line_number, line) for every non-blank, non-comment line
+    with open(path) as log:
+        for line_number, line in enumerate(log, 1):
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line_number, line
+
+
+def parse_expense_log(lines, jsonl=False):
+    # Text logs hold EXPENSE commands. JSONL records look like
+    # {"payer": "u1", "amount": "10.50", "users": ["u1", "u2"], "type": "EQUAL", "details": null}
+    for line_number, line in lines:
+        try:
+            if jsonl:
+                record = json.loads(line)
+                expense = (record["type"], record["amount"], record["users"], record["payer"], record.get("details"))
+            else:
+                expense = parse_expense_command(line)
+        except (ValueError, KeyError, TypeError) as error:
+            raise ValueError(f"Line {line_number}: malformed expense ({error})") from error
+        yield line_number, expense
+
+
+class ExpenseJournal:
+    # Append-only JSONL journal of applied expenses plus periodic snapshots of the ledger.
+    # Records are written through a buffer and fsynced every fsync_every records, so a crash
+    # can lose at most the last fsync_every - 1 expenses; startup replays only the records
+    # written after the latest snapshot. The journal is never cut back: it is the one copy of
+    # every expense, and read_expense finds an expense through expenses.index, which holds one
+    # 8-byte journal offset per expense ID, so undo needs no expense records in memory.
+    OFFSET = struct.Struct("<q")
+
+    def __init__(self, directory, snapshot_every=100_000, fsync_every=1_000):
+        os.makedirs(directory, exist_ok=True)
+        self._journal_path = os.path.join(directory, "expenses.journal")
+        self._snapshot_path = os.path.join(directory, "expenses.snapshot")
+        self._index_path = os.path.join(directory, "expenses.index")
+        self._snapshot_every = snapshot_every
+        self._fsync_every = fsync_every
+        self._seq = 0  # Sequence number of the last journaled record
+        self._size = 0  # Journal bytes, where the next record starts
+        self._since_snapshot = 0
+        self._since_sync = 0
+        self._file = None
+        self._index = None
+
+    def load(self):
+        # Returns the latest snapshot (or None) and an iterator over the records after it
+        self.close()
+        self._seq = 0
+        self._size = 0
+        self._since_snapshot = 0
+        snapshot = None
+        if os.path.exists(self._snapshot_path):
+            with open(self._snapshot_path) as f:
+                snapshot = json.load(f)
+            self._seq = snapshot["seq"]
+            self._size = snapshot["offset"]
+        return snapshot, self._read_tail()
+
+    def _read_tail(self):
+        # Yields records newer than the snapshot, stopping at a torn final write. Their index
+        # entries are written again, as the crash may have lost them
+        if not os.path.exists(self._journal_path):
+            return
+        with open(self._journal_path, "rb") as f:
+            f.seek(self._size)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                offset = self._size
+                self._size += len(line)
+                if record[0] <= self._seq:
+                    continue
+                self._seq = record[0]
+                self._since_snapshot += 1
+                self._since_sync += 1
+                self._index_record(record[1:], offset)
+                yield record[1:]
+        # Cut off a torn tail so new appends start on a clean line
+        if os.path.getsize(self._journal_path) > self._size:
+            with open(self._journal_path, "r+b") as f:
+                f.truncate(self._size)
+
+    def _index_record(self, record, offset):
+        # An add points its expense ID at the record, an undo clears it. Offsets are stored
+        # plus one, so the zeros of a never-written entry read as no expense
+        self._open_index()
+        self._index.seek((record[1] - 1) * self.OFFSET.size)
+        self._index.write(self.OFFSET.pack(offset + 1 if record[0] == "add" else 0))
+
+    def _open_index(self):
+        if self._index is None:
+            self._index = open(self._index_path, "r+b" if os.path.exists(self._index_path) else "w+b")
+
+    def append(self, record):
+        self._seq += 1
+        self._since_snapshot += 1
+        if self._file is None:
+            self._file = open(self._journal_path, "ab")
+        line = (json.dumps([self._seq] + record, separators=(",", ":")) + "\n").encode()
+        self._file.write(line)
+        self._index_record(record, self._size)
+        self._size += len(line)
+        self._since_sync += 1
+        if self._since_sync >= self._fsync_every:
+            self.sync()
+
+    def read_expense(self, expense_id):
+        # The "add" record of an expense that has not been undone, or None
+        if expense_id < 1 or self._index is None and not os.path.exists(self._index_path):
+            return None
+        self._open_index()
+        self._index.seek((expense_id - 1) * self.OFFSET.size)
+        entry = self._index.read(self.OFFSET.size)
+        if len(entry) < self.OFFSET.size or not self.OFFSET.unpack(entry)[0]:
+            return None
+        if self._file is not None:
+            self._file.flush()
+        with open(self._journal_path, "rb") as f:
+            f.seek(self.OFFSET.unpack(entry)[0] - 1)
+            record = json.loads(f.readline())[1:]
+        return record if record[0] == "add" and record[1] == expense_id else None
+
+    def sync(self):
+        if self._since_sync:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            if self._index is not None:
+                self._index.flush()
+                os.fsync(self._index.fileno())
+        self._since_sync = 0
+
+    def snapshot_due(self):
+        return self._since_snapshot >= self._snapshot_every
+
+    def write_snapshot(self, state):
+        # The journal and index are synced first, so a snapshot never covers records a crash
+        # could lose. Startup then replays from state["offset"]
+        self.sync()
+        state["seq"] = self._seq
+        state["offset"] = self._size
+        tmp_path = self._snapshot_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps(state, separators=(",", ":")))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._snapshot_path)
+        self._since_snapshot = 0
+
+    def close(self):
+        self.sync()
+        for f in (self._file, self._index):
+            if f is not None:
+                f.close()
+        self._file = None
+        self._index = None
 
 
 class ExpenseProcessor:
-    def __init__(self, user_manager, transaction_manager):
+    def __init__(self, user_manager, transaction_manager, journal=None):
         self.user_manager = user_manager
         self.transaction_manager = transaction_manager
+        # Expenses are not kept in memory, so ingestion runs in constant memory. With a journal,
+        # undo reads the expense back from it
+        self.next_expense_id = 1
+        self.journal = journal
+        if journal is not None:
+            self._recover()
 
-    def add_expense(self, expense_type, amount, user_ids, payer_id, details=None):
-        users = [self.user_manager.get_user(uid) for uid in user_ids]
-        payer = self.user_manager.get_user(payer_id)
+    def _resolve(self, expense_type, user_ids, payer_id):
+        get_user = self.user_manager.get_user
+        users = [get_user(uid) for uid in user_ids]
+        payer = get_user(payer_id)
 
-        if not payer or any(user is None for user in users):
+        if not payer or None in users:
             raise ValueError("Invalid payer or user IDs")
 
+        return SplitFactory.get_split(expense_type), users, payer
+
+    def add_expense(self, expense_type, amount, user_ids, payer_id, details=None):
+        # Returns the new expense ID
+        split, users, payer = self._resolve(expense_type, user_ids, payer_id)
+        return self._apply(split, to_cents(amount), users, payer, details)
+
+    def _apply(self, split, amount, users, payer, details):
+        shares = split.get_shares(amount, users, details)
+        user_ids = []
+        cents = []
+        for user, share in zip(users, shares):
+            if user is not payer and share:
+                user_ids.append(user.user_id)
+                cents.append(share)
+        expense_id = self.next_expense_id
+        self._record(expense_id, payer.user_id, user_ids, cents)
+        self._journal(["add", expense_id, payer.user_id, user_ids, cents])
+        return expense_id
+
+    def _record(self, expense_id, payer_id, user_ids, cents):
+        adjust_transaction = self.transaction_manager.adjust_transaction
+        for user_id, share in zip(user_ids, cents):
+            adjust_transaction(payer_id, user_id, share)
+        self.next_expense_id = max(self.next_expense_id, expense_id + 1)
+
+    def undo_expense(self, expense_id):
+        # Applies the inverse of every adjustment the expense made, O(participants). The undo
+        # record repeats the split, so replaying it never has to look the expense up
+        if self.journal is None:
+            raise ValueError("Undo needs an expense journal")
+        record = self.journal.read_expense(expense_id)
+        if record is None:
+            raise ValueError(f"Unknown expense {expense_id}")
+        _, _, payer_id, user_ids, cents = record
+        self._undo(payer_id, user_ids, cents)
+        self._journal(["undo", expense_id, payer_id, user_ids, cents])
+
+    def _undo(self, payer_id, user_ids, cents):
+        adjust_transaction = self.transaction_manager.adjust_transaction
+        for user_id, share in zip(user_ids, cents):
+            adjust_transaction(payer_id, user_id, -share)
+
+    def _journal(self, record):
+        if self.journal is None:
+            return
+        self.journal.append(record)
+        if self.journal.snapshot_due():
+            self.journal.write_snapshot(self.to_snapshot())
+
+    def to_snapshot(self):
+        # Ledger rows as [user_id, [[other_id, cents], ...]] and net balances as [user_id, cents],
+        # both in ledger order. Expenses stay in the journal, so a snapshot is O(ledger)
+        transaction_manager = self.transaction_manager
+        ledger = [[user_id, list(row.items())] for user_id, row in transaction_manager.get_balances().items()]
+        net_balances = list(transaction_manager.net_balances.items())
+        return {"next_expense_id": self.next_expense_id, "ledger": ledger, "net_balances": net_balances}
+
+    def _recover(self):
+        # Rebuild the ledger from the latest snapshot, then replay the journal tail
+        snapshot, records = self.journal.load()
+        if snapshot is not None:
+            self.transaction_manager.restore(snapshot["ledger"], snapshot["net_balances"])
+            self.next_expense_id = snapshot["next_expense_id"]
+        for record in records:
+            if record[0] == "add":
+                self._record(record[1], record[2], record[3], record[4])
+            else:
+                self._undo(record[2], record[3], record[4])
+
+    def validate_expenses(self, expenses):
+        # (line_number, expense) pairs in, resolved (line_number, split, cents, users, payer, details) out
+        for line_number, (expense_type, amount, user_ids, payer_id, details) in expenses:
+            try:
+                split, users, payer = self._resolve(expense_type, user_ids, payer_id)
+                cents = to_cents(amount)
+            except (ValueError, ArithmeticError) as error:
+                raise ValueError(f"Line {line_number}: {error}") from error
+            yield line_number, split, cents, users, payer, details
+
+    def apply_expenses(self, expenses):
+        # Applies validated expenses in order and returns how many were applied
+        count = 0
+        for line_number, split, amount, users, payer, details in expenses:
+            try:
+                self._apply(split, amount, users, payer, details)
+            except (ValueError, ArithmeticError) as error:
+                raise ValueError(f"Line {line_number}: {error}") from error
+            count += 1
+        return count
+
+
+class VectorBalanceEngine:
+    # Net balances for analytics over large batches, computed with NumPy instead of one
+    # perform_split per expense. User IDs map to dense indices. Each participant row moves its
+    # share from the participant to the payer (a payer's own row cancels out), so a whole batch
+    # becomes two bincount scatters. Shares follow the same largest-remainder rules as the
+    # split classes, so get_net_balances matches TransactionManager.net_balances exactly.
+    def __init__(self):
+        if np is None:
+            raise ImportError("VectorBalanceEngine needs NumPy")
+        self.user_ids = []
+        self.indices = {}
+        self.net = np.zeros(0, dtype=np.int64)
+
+    def intern(self, user_id):
+        index = self.indices.get(user_id)
+        if index is None:
+            index = self.indices[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+        return index
+
+    def add_expenses(self, expenses):
+        # (expense_type, amount, user_ids, payer_id, details) tuples, parsed the same way as
+        # add_expense. The batch is validated before anything is applied
+        columns = {expense_type: ([], [], [], [], []) for expense_type in ("EQUAL", "PERCENT", "EXACT")}
+        intern = self.intern
+        for expense_type, amount, user_ids, payer_id, details in expenses:
+            if expense_type not in columns:
+                raise ValueError("Invalid expense type")
+            payers, amounts, counts, participants, values = columns[expense_type]
+            payers.append(intern(payer_id))
+            amounts.append(to_cents(amount))
+            counts.append(len(user_ids))
+            participants.extend(intern(user_id) for user_id in user_ids)
+            # Values are laid out one per participant row, so a short or long list would shift
+            # onto the rows of the expenses after it
+            if expense_type != "EQUAL" and len(details) != len(user_ids):
+                raise ValueError(f"{expense_type} needs one value per user, "
+                                 f"got {len(details)} for {len(user_ids)} users")
+            if expense_type == "PERCENT":
+                weights, scale = PercentSplit._weights(details)
+                if sum(weights) != 100 * scale:
+                    raise ValueError("Percentages must add up to 100.")
+                values.extend(weights)
+            elif expense_type == "EXACT":
+                values.extend(to_cents(exact_amount) for exact_amount in details)
+
+        batches = []
+        for expense_type, (payers, amounts, counts, participants, values) in columns.items():
+            if not payers:
+                continue
+            arrays = [np.asarray(column, dtype=np.int64) for column in (payers, amounts, counts, participants)]
+            if expense_type == "EQUAL":
+                batches.append(self._equal_shares(*arrays))
+            elif expense_type == "PERCENT":
+                batches.append(self._weighted_shares(*arrays, np.asarray(values, dtype=np.int64)))
+            else:
+                batches.append(self._exact_shares(*arrays, np.asarray(values, dtype=np.int64)))
+        for batch in batches:
+            self._scatter(*batch)
+
+    # The add_* methods take columns of dense indices (see intern): one entry per expense in
+    # payers, amounts (cents) and counts, and one per participant row in participants
+    def add_equal(self, payers, amounts, counts, participants):
+        self._scatter(*self._equal_shares(payers, amounts, counts, participants))
+
+    def add_weighted(self, payers, amounts, counts, participants, weights):
+        self._scatter(*self._weighted_shares(payers, amounts, counts, participants, weights))
+
+    def add_exact(self, payers, amounts, counts, participants, shares):
+        self._scatter(*self._exact_shares(payers, amounts, counts, participants, shares))
+
+    @staticmethod
+    def _rows(counts):
+        # Expense number and position within the expense for every participant row
+        starts = np.cumsum(counts) - counts
+        expense_of_row = np.repeat(np.arange(len(counts)), counts)
+        return starts, expense_of_row, np.arange(len(expense_of_row)) - starts[expense_of_row]
+
+    def _equal_shares(self, payers, amounts, counts, participants):
+        # The first amount % count participants get one cent more, like EqualSplit
+        _, expense_of_row, position = self._rows(counts)
+        shares, leftover = np.divmod(amounts, counts)
+        shares = shares[expense_of_row] + (position < leftover[expense_of_row])
+        return payers[expense_of_row], participants, shares
+
+    def _weighted_shares(self, payers, amounts, counts, participants, weights):
+        # Floor every share, then hand the leftover cents to the largest remainders, earlier
+        # positions first on ties, like allocate_cents
+        starts, expense_of_row, position = self._rows(counts)
+        total_weights = np.add.reduceat(weights, starts)
+        shares, remainders = np.divmod(amounts[expense_of_row] * weights, total_weights[expense_of_row])
+        leftover = amounts - np.add.reduceat(shares, starts)
+        # Rows sorted by expense, then largest remainder. Rows are already in position order,
+        # so a stable sort on one combined key breaks ties the same way and is far quicker
+        # than lexsort; fall back to lexsort if the key could overflow
+        spread = int(remainders.max(initial=0)) + 1
+        if len(counts) * spread < 2 ** 62:
+            order = np.argsort(expense_of_row * spread + (spread - 1 - remainders), kind="stable")
+        else:
+            order = np.lexsort((position, -remainders, expense_of_row))
+        rank = np.arange(len(order)) - starts[expense_of_row[order]]
+        shares[order] += rank < leftover[expense_of_row[order]]
+        return payers[expense_of_row], participants, shares
+
+    def _exact_shares(self, payers, amounts, counts, participants, shares):
+        starts, expense_of_row, _ = self._rows(counts)
+        if np.any(np.add.reduceat(shares, starts) != amounts):
+            raise ValueError("Exact amounts must sum to the total amount.")
+        return payers[expense_of_row], participants, shares
+
+    def _scatter(self, payer_rows, participants, shares):
+        size = len(self.user_ids)
+        if len(self.net) < size:
+            self.net = np.concatenate([self.net, np.zeros(size - len(self.net), dtype=np.int64)])
+        # bincount sums in float64, which is exact while a user's total in one batch stays
+        # under 2**53 cents
+        delta = (np.bincount(payer_rows, weights=shares, minlength=size)
+                 - np.bincount(participants, weights=shares, minlength=size))
+        self.net += np.rint(delta).astype(np.int64)
+
+    def get_net_balances(self):
+        # Net cents per user with a non-zero balance, positive means owed money
+        return {self.user_ids[index]: int(self.net[index]) for index in np.flatnonzero(self.net)}
+
+
+class Group:
+    # Expenses inside a group only move money between its members, so each group keeps its
+    # own ledger. Members are stand-in Users holding just the ID, since a group may live in a
+    # worker process that has no UserManager.
+    def __init__(self, group_id, name, member_ids):
+        self.group_id = group_id
+        self.name = name
+        self.members = {}
+        self.transaction_manager = TransactionManager()
+        for member_id in member_ids:
+            self.add_member(member_id)
+
+    def get_id(self):
+        return self.group_id
+
+    def add_member(self, member_id):
+        self.members.setdefault(member_id, User(member_id, member_id, None, None))
+
+    def add_expense(self, expense_type, amount, user_ids, payer_id, details=None):
+        users = [self.members.get(uid) for uid in user_ids]
+        payer = self.members.get(payer_id)
+
+        if not payer or None in users:
+            raise ValueError(f"Invalid payer or user IDs for group {self.group_id}")
+
         split = SplitFactory.get_split(expense_type)
-        split.perform_split(amount, users, payer, details, self.transaction_manager)
+        split.perform_split(to_cents(amount), users, payer, details, self.transaction_manager)
 
 
-class ExpenseSharingApp:
+class LedgerShard:
+    # The groups owned by one worker
     def __init__(self):
+        self.groups = {}
+
+    def _get_group(self, group_id):
+        group = self.groups.get(group_id)
+        if group is None:
+            raise ValueError(f"Unknown group {group_id}")
+        return group
+
+    def add_group(self, group_id, name, member_ids):
+        self.groups[group_id] = Group(group_id, name, member_ids)
+
+    def add_member(self, group_id, member_id):
+        self._get_group(group_id).add_member(member_id)
+
+    def add_expenses(self, expenses):
+        # (group_id, expense_type, amount, user_ids, payer_id, details) tuples, applied in order
+        for group_id, expense_type, amount, user_ids, payer_id, details in expenses:
+            self._get_group(group_id).add_expense(expense_type, amount, user_ids, payer_id, details)
+        return len(expenses)
+
+    def get_balances(self, group_id):
+        return self._get_group(group_id).transaction_manager.get_balances()
+
+    def simplify(self, group_id):
+        return self._get_group(group_id).transaction_manager.simplify()
+
+    def get_net_balances(self):
+        # Net cents per user summed over every group in this shard
+        net_balances = {}
+        for group in self.groups.values():
+            for user_id, net in group.transaction_manager.net_balances.items():
+                net_balances[user_id] = net_balances.get(user_id, 0) + net
+        return net_balances
+
+
+# The shard owned by this worker process
+_worker_shard = None
+
+
+def _init_worker_shard():
+    global _worker_shard
+    _worker_shard = LedgerShard()
+
+
+def _call_worker_shard(method, args):
+    return getattr(_worker_shard, method)(*args)
+
+
+class ShardedLedger:
+    # Group ledgers spread over worker processes. Every worker is its own single-process pool, so
+    # a group always lands in the same process (picked by a stable hash of its ID) and calls to
+    # it run in submission order. workers=0 keeps one shard in this process.
+    def __init__(self, workers=0):
+        self._count = max(workers, 1)
+        self._local = LedgerShard() if not workers else None
+        self._executors = [ProcessPoolExecutor(max_workers=1, initializer=_init_worker_shard)
+                           for _ in range(workers)]
+
+    def _shard_of(self, group_id):
+        return zlib.crc32(str(group_id).encode()) % self._count
+
+    def _submit(self, shard, method, *args):
+        if self._local is None:
+            return self._executors[shard].submit(_call_worker_shard, method, args)
+        future = Future()
+        try:
+            future.set_result(getattr(self._local, method)(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+    def _call(self, group_id, method, *args):
+        return self._submit(self._shard_of(group_id), method, group_id, *args).result()
+
+    def add_group(self, group_id, name, member_ids):
+        self._call(group_id, "add_group", name, list(member_ids))
+
+    def add_member(self, group_id, member_id):
+        self._call(group_id, "add_member", member_id)
+
+    def add_expenses(self, expenses, chunk_size=5_000):
+        # Routes (group_id, expense_type, amount, user_ids, payer_id, details) tuples to their
+        # shards in chunks, so workers apply one chunk while the next is being routed. At most
+        # two chunks per worker are in flight, which keeps memory flat for long streams.
+        # Returns the number applied; a bad expense raises once its chunk is reached.
+        chunks = [[] for _ in range(self._count)]
+        pending = deque()
+        applied = 0
+        for expense in expenses:
+            shard = self._shard_of(expense[0])
+            chunk = chunks[shard]
+            chunk.append(expense)
+            if len(chunk) >= chunk_size:
+                pending.append(self._submit(shard, "add_expenses", chunk))
+                chunks[shard] = []
+                while len(pending) > 2 * self._count:
+                    applied += pending.popleft().result()
+        for shard, chunk in enumerate(chunks):
+            if chunk:
+                pending.append(self._submit(shard, "add_expenses", chunk))
+        while pending:
+            applied += pending.popleft().result()
+        return applied
+
+    def get_balances(self, group_id):
+        return self._call(group_id, "get_balances")
+
+    def simplify(self, group_id):
+        return self._call(group_id, "simplify")
+
+    def get_net_balances(self):
+        # Net cents per user over all groups, merged from every shard
+        futures = [self._submit(shard, "get_net_balances") for shard in range(self._count)]
+        net_balances = {}
+        for future in futures:
+            for user_id, net in future.result().items():
+                net_balances[user_id] = net_balances.get(user_id, 0) + net
+        return {user_id: net for user_id, net in net_balances.items() if net}
+
+    def top_creditors(self, limit):
+        top = heapq.nlargest(limit, ((net, user_id) for user_id, net in self.get_net_balances().items() if net > 0))
+        return [(user_id, net) for net, user_id in top]
+
+    def top_debtors(self, limit):
+        top = heapq.nsmallest(limit, ((net, user_id) for user_id, net in self.get_net_balances().items() if net < 0))
+        return [(user_id, -net) for net, user_id in top]
+
+    def close(self):
+        for executor in self._executors:
+            executor.shutdown()
+
+
+class BalanceRow:
+    # One "debtor owes creditor" line of a balance report. Rows hold user IDs and names are
+    # looked up only when the row is formatted, so a replaced user shows under the new name
+    __slots__ = ("debtor_id", "creditor_id", "cents")
+
+    def __init__(self, debtor_id, creditor_id, cents):
+        self.debtor_id = debtor_id
+        self.creditor_id = creditor_id
+        self.cents = cents
+
+    def get_amount(self):
+        return format_cents(self.cents)
+
+    def format(self, user_manager):
+        debtor = user_manager.get_user(self.debtor_id)
+        creditor = user_manager.get_user(self.creditor_id)
+        return f"{debtor.get_name()} owes {creditor.get_name()}: {self.get_amount()}"
+
+
+class BalanceReport:
+    # SHOW results over a ledger, cached per user. A user's rows are rebuilt only after an
+    # adjustment touched that user, and text is built only when asked for and rebuilt after
+    # either the ledger or the users changed
+    def __init__(self, user_manager, transaction_manager):
+        self.user_manager = user_manager
+        self.transaction_manager = transaction_manager
+        self._rows = {}  # user_id -> (version, rows)
+        self._text = {}  # user_id, or None for the full report -> ((version, user version), text)
+
+    def user_rows(self, user_id):
+        # Every debt involving the user, in ledger order
+        version = self.transaction_manager.versions.get(user_id, 0)
+        cached = self._rows.get(user_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        rows = []
+        for other_id, balance in self.transaction_manager.get_balances(user_id).items():
+            if balance < 0:
+                rows.append(BalanceRow(user_id, other_id, -balance))
+            elif balance > 0:
+                rows.append(BalanceRow(other_id, user_id, balance))
+        self._rows[user_id] = (version, rows)
+        return rows
+
+    def iter_rows(self, user_id=None):
+        # Streams one user's rows, or every debt once (listed under its debtor), so large
+        # reports can be paged with itertools.islice instead of built in full
+        if user_id is not None:
+            yield from self.user_rows(user_id)
+            return
+        for debtor_id in list(self.transaction_manager.get_balances()):
+            for row in self.user_rows(debtor_id):
+                if row.debtor_id == debtor_id:
+                    yield row
+
+    def format(self, user_id=None):
+        if user_id is None:
+            version = (self.transaction_manager.version, self.user_manager.version)
+        else:
+            version = (self.transaction_manager.versions.get(user_id, 0), self.user_manager.version)
+        cached = self._text.get(user_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        user_manager = self.user_manager
+        text = "\n".join(row.format(user_manager) for row in self.iter_rows(user_id)) or "No balances."
+        self._text[user_id] = (version, text)
+        return text
+
+
+class ExpenseSharingApp:
+    def __init__(self, workers=0, journal=None):
+        # With a journal, the ledger is recovered from it and every expense is journaled
         self.user_manager = UserManager()
-        self.transaction_manager = None
-        self.expense_processor = None
+        self.journal = journal
+        self.setup_transactions()
+        # Group ledgers, spread over this many worker processes (0 keeps them in process)
+        self.groups = ShardedLedger(workers)
 
     def add_user(self, user_id, name, email, phone):
         self.user_manager.add_user(user_id, name, email, phone)
 
     def setup_transactions(self):
-        self.transaction_manager = TransactionManager(self.user_manager.get_all_users())
-        self.expense_processor = ExpenseProcessor(self.user_manager, self.transaction_manager)
+        # Starts an empty ledger. Users added later need no rebuild
+        self.transaction_manager = TransactionManager()
+        self.expense_processor = ExpenseProcessor(self.user_manager, self.transaction_manager, self.journal)
+        self.balance_report = BalanceReport(self.user_manager, self.transaction_manager)
+
+    def add_group(self, group_id, name, user_ids):
+        if any(self.user_manager.get_user(uid) is None for uid in user_ids):
+            raise ValueError("Invalid user IDs")
+        self.groups.add_group(group_id, name, user_ids)
+
+    def close(self):
+        self.groups.close()
+        if self.journal is not None:
+            self.journal.close()
 
     def process_input(self, command):
-        if command.startswith("SHOW"):
+        if command.startswith("GROUP"):
+            # GROUP <group_id> EXPENSE ... | SHOW | SETTLE, run against that group's ledger
+            _, group_id, group_command = command.split(maxsplit=2)
+            if group_command.startswith("EXPENSE"):
+                self.groups.add_expenses([(group_id,) + parse_expense_command(group_command)])
+                return "Expense added successfully."
+            if group_command.startswith("SETTLE"):
+                return self._format_settlement(self.groups.simplify(group_id))
+            return self._format_balances(self.groups.get_balances(group_id))
+
+        elif command.startswith("SHOW"):
             parts = command.split()
             if len(parts) == 1:
                 return self._show_balances()
             else:
                 return self._show_user_balances(parts[1])
 
-        elif command.startswith("EXPENSE"):
+        elif command.startswith("UNDO"):
+            expense_id = int(command.split()[1])
+            self.expense_processor.undo_expense(expense_id)
+            return f"Expense {expense_id} undone."
+
+        elif command.startswith("SETTLE"):
+            return self._show_settlement()
+
+        elif command.startswith("NET"):
+            return self._show_net_balance(command.split()[1])
+
+        elif command.startswith("TOP"):
             parts = command.split()
-            payer_id = parts[1]
-            amount = Decimal(parts[2])
-            num_users = int(parts[3])
-            user_ids = parts[4:4 + num_users]
-            expense_type = parts[4 + num_users]
-            details = parts[5 + num_users:] if len(parts) > 5 + num_users else None
-            self.expense_processor.add_expense(expense_type, amount, user_ids, payer_id, details)
+            return self._show_top_balances(int(parts[1]) if len(parts) > 1 else 10)
+
+        elif command.startswith("EXPENSE"):
+            self.expense_processor.add_expense(*parse_expense_command(command))
             return "Expense added successfully."
 
+    def ingest(self, path):
+        # Streams a log of EXPENSE commands, or JSONL records for a .jsonl path, into the ledger.
+        # Stops with a ValueError naming the line on the first bad expense; earlier lines stay applied.
+        expenses = parse_expense_log(read_expense_log(path), jsonl=path.endswith(".jsonl"))
+        return self.expense_processor.apply_expenses(self.expense_processor.validate_expenses(expenses))
+
     def _show_balances(self):
-        transactions = self.transaction_manager.get_balances()
-        return self._format_balances(transactions)
+        return self.balance_report.format()
 
-    def _show_user_balances(self, user_id):
+    def _show_settlement(self):
+        return self._format_settlement(self.transaction_manager.simplify())
+
+    def _format_settlement(self, plan):
+        output = [f"{self.user_manager.get_user(debtor_id).get_name()} pays {self.user_manager.get_user(creditor_id).get_name()}: {format_cents(amount)}"
+                  for debtor_id, creditor_id, amount in plan]
+        return "\n".join(output) if output else "No balances."
+
+    def _show_net_balance(self, user_id):
         user = self.user_manager.get_user(user_id)
         if not user:
             return "Invalid user ID."
-        transactions = self.transaction_manager.get_balances(user_id)
-        return self._format_user_balances(user_id, transactions)
+        net = self.transaction_manager.get_net_balance(user_id)
+        if net > 0:
+            return f"{user.get_name()} is owed {format_cents(net)} in total"
+        if net < 0:
+            return f"{user.get_name()} owes {format_cents(-net)} in total"
+        return "No balances."
 
-    def _format_balances(self, transactions):
-        output = []
-        for user_id, balances in transactions.items():
-            for other_id, balance in balances.items():
-                if balance < 0:
-                    output.append(f"{self.user_manager.get_user(user_id).get_name()} owes {self.user_manager.get_user(other_id).get_name()}: {-balance}")
+    def _show_top_balances(self, limit):
+        # The users owed the most followed by the users who owe the most
+        output = [f"{self.user_manager.get_user(user_id).get_name()} is owed {format_cents(cents)}"
+                  for user_id, cents in self.transaction_manager.top_creditors(limit)]
+        output += [f"{self.user_manager.get_user(user_id).get_name()} owes {format_cents(cents)}"
+                   for user_id, cents in self.transaction_manager.top_debtors(limit)]
         return "\n".join(output) if output else "No balances."
 
-    def _format_user_balances(self, user_id, balances):
-        output = []
+    def _show_user_balances(self, user_id):
         user = self.user_manager.get_user(user_id)
-        for other_id, balance in balances.items():
-            if balance < 0:
-                output.append(f"{user.get_name()} owes {self.user_manager.get_user(other_id).get_name()}: {-balance}")
-            elif balance > 0:
-                output.append(f"{self.user_manager.get_user(other_id).get_name()} owes {user.get_name()}: {balance}")
+        if not user:
+            return "Invalid user ID."
+        return self.balance_report.format(user_id)
+
+    def _format_balances(self, transactions):
+        # Uncached report for ledgers held elsewhere, such as group shards
+        user_manager = self.user_manager
+        output = [BalanceRow(user_id, other_id, -balance).format(user_manager)
+                  for user_id, balances in transactions.items()
+                  for other_id, balance in balances.items() if balance < 0]
         return "\n".join(output) if output else "No balances."
 
 
 if __name__ == "__main__":
-    app = ExpenseSharingApp()
+    # UNDO reads expenses back from the journal, so the demo journals into a scratch directory
+    journal_directory = tempfile.mkdtemp(prefix="splitwise-demo-")
+    app = ExpenseSharingApp(journal=ExpenseJournal(journal_directory))
     
     # Adding users
     app.add_user("u1", "User1", "user1@example.com", "1234567890")
@@ -203,3 +1157,17 @@ if __name__ == "__main__":
     print(app.process_input("EXPENSE u4 1200 4 u1 u2 u3 u4 PERCENT 40 20 20 20"))
     print(app.process_input("SHOW u1"))
     print(app.process_input("SHOW"))
+    print(app.process_input("SETTLE"))
+    print(app.process_input("NET u1"))
+    print(app.process_input("TOP 2"))
+    print(app.process_input("UNDO 3"))
+    print(app.process_input("SHOW"))
+
+    # Groups keep their own ledgers
+    app.add_group("g1", "Trip", ["u1", "u2", "u3"])
+    print(app.process_input("GROUP g1 EXPENSE u2 300 3 u1 u2 u3 EQUAL"))
+    print(app.process_input("GROUP g1 EXPENSE u3 90 2 u1 u3 EQUAL"))
+    print(app.process_input("GROUP g1 SHOW"))
+    print(app.process_input("GROUP g1 SETTLE"))
+    app.close()
+    shutil.rmtree(journal_directory)
@@ -32,19 +32,33 @@ class UserManager:
 
 
 class TransactionManager:
-    def __init__(self, users):
-        self.transactions = {
-            user.get_id(): {other.get_id(): Decimal('0.00') for other in users}
-            for user in users
-        }
+    # Sparse ledger, only non-zero pairwise balances are stored. transactions[a][b] > 0 means
+    # b owes a, and transactions[b][a] always holds the negated amount. Users need no
+    # registration here, so they can be added at any time.
+    def __init__(self):
+        self.transactions = {}
 
     def adjust_transaction(self, payer_id, user_id, amount):
-        self.transactions[user_id][payer_id] -= amount
-        self.transactions[payer_id][user_id] += amount
+        if payer_id == user_id or not amount:
+            return
+        payer_balances = self.transactions.setdefault(payer_id, {})
+        user_balances = self.transactions.setdefault(user_id, {})
+        balance = payer_balances.get(user_id, 0) + amount
+        if balance:
+            payer_balances[user_id] = balance
+            user_balances[payer_id] = -balance
+            return
+        # Settled pairs are dropped so memory follows the outstanding debts
+        del payer_balances[user_id]
+        del user_balances[payer_id]
+        if not payer_balances:
+            del self.transactions[payer_id]
+        if not user_balances:
+            del self.transactions[user_id]
 
     def get_balances(self, user_id=None):
         if user_id:
-            return self.transactions[user_id]
+            return self.transactions.get(user_id, {})
         return self.transactions
 
 
@@ -114,14 +128,15 @@ class ExpenseProcessor:
 class Wallet:
     def __init__(self):
         self.user_manager = UserManager()
-        self.transaction_manager = None
-        self.expense_processor = None
+        self.transaction_manager = TransactionManager()
+        self.expense_processor = ExpenseProcessor(self.user_manager, self.transaction_manager)
 
     def setup_wallet(self, users):
         for user_id, name in users:
-            self.user_manager.add_user(user_id, name)
-        self.transaction_manager = TransactionManager(self.user_manager.get_all_users())
-        self.expense_processor = ExpenseProcessor(self.user_manager, self.transaction_manager)
+            self.add_user(user_id, name)
+
+    def add_user(self, user_id, name):
+        self.user_manager.add_user(user_id, name)
 
     def show_balances(self, user_id=None):
         transactions = self.transaction_manager.get_balances(user_id)
@@ -0,0 +1,360 @@
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+import tracemalloc
+from decimal import Decimal, ROUND_HALF_UP
+
+from splitwise import (ExpenseJournal, ExpenseProcessor, ExpenseSharingApp, ShardedLedger, SplitFactory,
+                       TransactionManager, User, UserManager, VectorBalanceEngine, np, to_cents)
+
+
+# Users are split into groups of group_size; each expense is an equal split inside one group
+def build_app(num_users: int, group_size: int, expenses_per_group: int, seed: int) -> ExpenseSharingApp:
+    rng = random.Random(seed)
+    app = ExpenseSharingApp()
+    for i in range(num_users):
+        app.add_user(f"u{i}", f"User{i}", f"user{i}@example.com", "0000000000")
+
+    for group_start in range(0, num_users, group_size):
+        members = [f"u{i}" for i in range(group_start, min(group_start + group_size, num_users))]
+        for _ in range(expenses_per_group):
+            payer_id = rng.choice(members)
+            amount = Decimal(rng.randint(100, 1_000_000)) / 100
+            app.expense_processor.add_expense("EQUAL", amount, members, payer_id)
+    return app
+
+
+def bench_settle(num_users: int, group_size: int, expenses_per_group: int, seed: int):
+    started = time.perf_counter()
+    app = build_app(num_users, group_size, expenses_per_group, seed)
+    build_seconds = time.perf_counter() - started
+    ledger = app.transaction_manager
+    raw_debts = sum(1 for balances in ledger.get_balances().values() for balance in balances.values() if balance < 0)
+
+    started = time.perf_counter()
+    ledger.top_creditors(10)
+    index_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    ledger.top_creditors(10)
+    ledger.top_debtors(10)
+    top_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    plan = ledger.simplify()
+    settle_seconds = time.perf_counter() - started
+
+    # Applying the plan must leave every user at zero
+    net = ledger.get_net_balances()
+    for debtor_id, creditor_id, amount in plan:
+        net[debtor_id] += amount
+        net[creditor_id] -= amount
+    assert not any(net.values()), "settlement plan does not clear every balance"
+
+    print(f"{num_users:,} users in groups of {group_size}, {expenses_per_group} expenses per group "
+          f"(built in {build_seconds:.2f}s)")
+    print(f"raw pairwise debts: {raw_debts:,}, settlement transfers: {len(plan):,} "
+          f"({raw_debts / max(len(plan), 1):.2f}x fewer)")
+    print(f"simplify: {settle_seconds:.2f}s ({len(net) / settle_seconds:,.0f} users/s)")
+    print(f"top 10 creditors and debtors: {top_seconds * 1e6:.0f}us "
+          f"(first query folded {len(net):,} changed users into the index in {index_seconds:.2f}s)")
+
+
+# The Decimal split arithmetic that ran before the integer-cents ledger, kept as the baseline
+def _decimal_shares(expense_type, amount, count, details):
+    cent = Decimal("0.01")
+    if expense_type == "EQUAL":
+        return [(amount / count).quantize(cent, rounding=ROUND_HALF_UP)] * count
+    if expense_type == "PERCENT":
+        percentages = [Decimal(str(percentage)) for percentage in details]
+        return [(amount * (percentage / 100)).quantize(cent, rounding=ROUND_HALF_UP) for percentage in percentages]
+    return [Decimal(str(exact)).quantize(cent, rounding=ROUND_HALF_UP) for exact in details]
+
+
+def _random_expenses(num_expenses: int, group_size: int, seed: int) -> list:
+    rng = random.Random(seed)
+    expenses = []
+    for _ in range(num_expenses):
+        expense_type = rng.choice(("EQUAL", "PERCENT", "EXACT"))
+        amount_cents = rng.randint(100, 1_000_000)
+        details = None
+        if expense_type == "PERCENT":
+            details = [str(100 // group_size)] * group_size
+            details[0] = str(100 - 100 // group_size * (group_size - 1))
+        elif expense_type == "EXACT":
+            details = [str(Decimal(amount_cents // group_size) / 100)] * group_size
+            details[0] = str(Decimal(amount_cents - amount_cents // group_size * (group_size - 1)) / 100)
+        expenses.append((expense_type, str(Decimal(amount_cents) / 100), details))
+    return expenses
+
+
+def bench_splits(num_expenses: int, group_size: int, seed: int):
+    users = [User(f"u{i}", f"User{i}", "", "") for i in range(group_size)]
+    payer = users[0]
+    expenses = _random_expenses(num_expenses, group_size, seed)
+
+    ledger = TransactionManager()
+    started = time.perf_counter()
+    for expense_type, amount, details in expenses:
+        shares = _decimal_shares(expense_type, Decimal(amount), group_size, details)
+        for user, share in zip(users[1:], shares[1:]):
+            ledger.adjust_transaction(payer.get_id(), user.get_id(), share)
+    decimal_seconds = time.perf_counter() - started
+
+    ledger = TransactionManager()
+    started = time.perf_counter()
+    for expense_type, amount, details in expenses:
+        SplitFactory.get_split(expense_type).perform_split(to_cents(amount), users, payer, details, ledger)
+    cents_seconds = time.perf_counter() - started
+
+    print(f"{num_expenses:,} expenses across {group_size} users")
+    print(f"decimal splits: {decimal_seconds:.2f}s ({num_expenses / decimal_seconds:,.0f} expenses/s)")
+    print(f"integer cents:  {cents_seconds:.2f}s ({num_expenses / cents_seconds:,.0f} expenses/s), "
+          f"{decimal_seconds / cents_seconds:.2f}x")
+
+
+def _write_expense_log(path: str, num_lines: int, num_users: int, group_size: int, seed: int, jsonl: bool):
+    rng = random.Random(seed)
+    num_groups = max(num_users // group_size, 1)
+    with open(path, "w") as log:
+        for _ in range(num_lines):
+            group_start = rng.randrange(num_groups) * group_size
+            members = [f"u{i}" for i in range(group_start, group_start + group_size)]
+            payer_id = rng.choice(members)
+            amount = str(Decimal(rng.randint(100, 1_000_000)) / 100)
+            expense_type = rng.choice(("EQUAL", "PERCENT"))
+            details = None
+            if expense_type == "PERCENT":
+                details = [str(100 // group_size)] * group_size
+                details[0] = str(100 - 100 // group_size * (group_size - 1))
+            if jsonl:
+                record = {"payer": payer_id, "amount": amount, "users": members, "type": expense_type, "details": details}
+                log.write(json.dumps(record) + "\n")
+            else:
+                fields = ["EXPENSE", payer_id, amount, str(group_size)] + members + [expense_type] + (details or [])
+                log.write(" ".join(fields) + "\n")
+
+
+def bench_ingest(num_lines: int, num_users: int, group_size: int, seed: int):
+    directory = tempfile.mkdtemp(prefix="splitwise-bench-")
+    try:
+        for jsonl in (False, True):
+            path = os.path.join(directory, "expenses.jsonl" if jsonl else "expenses.txt")
+            _write_expense_log(path, num_lines, num_users, group_size, seed, jsonl)
+            app = ExpenseSharingApp()
+            for i in range(num_users):
+                app.add_user(f"u{i}", f"User{i}", f"user{i}@example.com", "0000000000")
+
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            started = time.perf_counter()
+            applied = app.ingest(path)
+            seconds = time.perf_counter() - started
+            rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+            print(f"{'jsonl' if jsonl else 'text'}: {applied:,} expenses from {os.path.getsize(path) / 1e6:.0f} MB "
+                  f"in {seconds:.2f}s ({applied / seconds:,.0f} lines/s, {applied * 60 / seconds / 1e6:.2f}M lines/min), "
+                  f"peak RSS +{(rss_after - rss_before) / 1024:.0f} MB")
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+def _group_expenses(num_groups: int, group_size: int, num_expenses: int, seed: int):
+    rng = random.Random(seed)
+    for _ in range(num_expenses):
+        group = rng.randrange(num_groups)
+        members = [f"g{group}u{i}" for i in range(group_size)]
+        yield f"g{group}", "EQUAL", str(Decimal(rng.randint(100, 1_000_000)) / 100), members, rng.choice(members), None
+
+
+def bench_groups(num_groups: int, group_size: int, num_expenses: int, max_workers: int, seed: int):
+    print(f"{num_expenses:,} expenses over {num_groups:,} groups of {group_size}, {os.cpu_count()} CPUs")
+    workers = 1
+    baseline = None
+    while workers <= max_workers:
+        ledger = ShardedLedger(workers)
+        for group in range(num_groups):
+            ledger.add_group(f"g{group}", f"Group {group}", [f"g{group}u{i}" for i in range(group_size)])
+
+        started = time.perf_counter()
+        applied = ledger.add_expenses(_group_expenses(num_groups, group_size, num_expenses, seed))
+        seconds = time.perf_counter() - started
+        creditors = ledger.top_creditors(1)
+        ledger.close()
+
+        rate = applied / seconds
+        baseline = baseline or rate
+        print(f"{workers} workers: {rate:,.0f} expenses/s ({rate / baseline:.2f}x), top creditor {creditors[0][0]}")
+        workers *= 2
+
+
+def bench_journal(num_expenses: int, num_users: int, group_size: int, snapshot_every: int, seed: int):
+    directory = tempfile.mkdtemp(prefix="splitwise-journal-")
+    try:
+        log_path = os.path.join(directory, "expenses.txt")
+        _write_expense_log(log_path, num_expenses, num_users, group_size, seed, jsonl=False)
+
+        def new_app(journal):
+            app = ExpenseSharingApp(journal=journal)
+            for i in range(num_users):
+                app.add_user(f"u{i}", f"User{i}", f"user{i}@example.com", "0000000000")
+            return app
+
+        rates = []
+        for journal in (None, ExpenseJournal(os.path.join(directory, "journal"), snapshot_every=snapshot_every)):
+            app = new_app(journal)
+            started = time.perf_counter()
+            app.ingest(log_path)
+            app.close()
+            rates.append(num_expenses / (time.perf_counter() - started))
+        balances = app.transaction_manager.get_balances()
+        report = app.balance_report.format()
+
+        started = time.perf_counter()
+        recovered = new_app(ExpenseJournal(os.path.join(directory, "journal"), snapshot_every=snapshot_every))
+        recovery_seconds = time.perf_counter() - started
+        assert recovered.transaction_manager.get_balances() == balances, "recovered ledger differs"
+        assert recovered.balance_report.format() == report, "recovered SHOW output differs"
+
+        started = time.perf_counter()
+        for expense_id in range(1, 1001):
+            recovered.expense_processor.undo_expense(expense_id)
+        undo_seconds = time.perf_counter() - started
+        recovered.close()
+
+        journal_bytes = os.path.getsize(os.path.join(directory, "journal", "expenses.journal"))
+        snapshot_path = os.path.join(directory, "journal", "expenses.snapshot")
+        snapshot_offset = 0
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path) as f:
+                snapshot_offset = json.load(f)["offset"]
+        tail_mb = (journal_bytes - snapshot_offset) / 1e6
+        print(f"{num_expenses:,} expenses: {rates[0]:,.0f}/s without journal, {rates[1]:,.0f}/s journaled "
+              f"({rates[1] / rates[0]:.2f}x)")
+        print(f"recovery from snapshot + {tail_mb:.1f} MB tail: {recovery_seconds:.2f}s, "
+              f"undo: {undo_seconds / 1000 * 1e6:.0f}us per expense")
+    finally:
+        shutil.rmtree(directory)
+
+
+def bench_vector(num_expenses: int, num_users: int, group_size: int, seed: int, chunk_size: int = 1_000_000):
+    if np is None:
+        print("NumPy is not installed, skipping the vector engine benchmark")
+        return
+    num_groups = max(num_users // group_size, 1)
+    rng = np.random.default_rng(seed)
+    engine = VectorBalanceEngine()
+    for i in range(num_groups * group_size):
+        engine.intern(f"u{i}")
+
+    # Columns are generated straight into arrays, 10M expenses as Python tuples would not fit
+    started = time.perf_counter()
+    done = 0
+    while done < num_expenses:
+        n = min(chunk_size, num_expenses - done)
+        groups = rng.integers(num_groups, size=n)
+        participants = (groups[:, None] * group_size + np.arange(group_size)).ravel()
+        payers = groups * group_size + rng.integers(group_size, size=n)
+        amounts = rng.integers(100, 1_000_000, size=n)
+        counts = np.full(n, group_size)
+        if (done // chunk_size) % 2 == 0:
+            engine.add_equal(payers, amounts, counts, participants)
+        else:
+            weights = rng.integers(1, 100, size=n * group_size)
+            engine.add_weighted(payers, amounts, counts, participants, weights)
+        done += n
+    vector_seconds = time.perf_counter() - started
+    assert engine.net.sum() == 0, "net balances do not cancel out"
+
+    # Scalar path against the vector engine on the same tuples
+    sample = [(expense_type, amount, [f"u{i}" for i in range(group_size)], "u0", details)
+              for expense_type, amount, details in _random_expenses(min(num_expenses, 200_000), group_size, seed)]
+    user_manager = UserManager()
+    for i in range(group_size):
+        user_manager.add_user(f"u{i}", f"User{i}", "", "")
+    ledger = TransactionManager()
+    processor = ExpenseProcessor(user_manager, ledger)
+    started = time.perf_counter()
+    for expense in sample:
+        processor.add_expense(*expense)
+    scalar_seconds = time.perf_counter() - started
+    check = VectorBalanceEngine()
+    started = time.perf_counter()
+    check.add_expenses(sample)
+    tuple_seconds = time.perf_counter() - started
+    assert check.get_net_balances() == ledger.net_balances, "vector and scalar balances differ"
+
+    vector_rate = num_expenses / vector_seconds
+    scalar_rate = len(sample) / scalar_seconds
+    print(f"vector engine: {num_expenses:,} expenses of {group_size} in {vector_seconds:.2f}s "
+          f"({vector_rate:,.0f} expenses/s, {vector_rate / scalar_rate:.0f}x scalar)")
+    print(f"scalar add_expense: {scalar_rate:,.0f} expenses/s; vector add_expenses on the same "
+          f"{len(sample):,} tuples: {len(sample) / tuple_seconds:,.0f} expenses/s, balances match")
+
+
+def bench_memory(num_users: int, group_size: int, expenses_per_group: int, seed: int):
+    # Heap held by users plus ledger, traced allocations only so the interpreter is not counted
+    tracemalloc.start()
+    app = ExpenseSharingApp()
+    for i in range(num_users):
+        app.add_user(f"u{i}", f"User{i}", f"user{i}@example.com", "0000000000")
+    users_bytes = tracemalloc.get_traced_memory()[0]
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    for group_start in range(0, num_users, group_size):
+        members = [f"u{i}" for i in range(group_start, min(group_start + group_size, num_users))]
+        for _ in range(expenses_per_group):
+            app.expense_processor.add_expense("EQUAL", str(rng.randint(100, 1_000_000)), members, rng.choice(members))
+    expense_seconds = time.perf_counter() - started
+    total_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    num_expenses = -(-num_users // group_size) * expenses_per_group
+    print(f"{num_users:,} users: {users_bytes / 1e6:.1f} MB ({users_bytes / num_users:.0f} bytes/user)")
+    print(f"+ {num_expenses:,} expenses: {total_bytes / 1e6:.1f} MB total, "
+          f"{(total_bytes - users_bytes) / num_expenses:.0f} bytes/expense, {expense_seconds:.2f}s under tracing")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Splitwise ledger benchmarks")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--group-size", type=int, default=10)
+    parser.add_argument("--expenses-per-group", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--splits", type=int, default=0,
+                        help="compare Decimal and integer-cents split arithmetic over this many expenses")
+    parser.add_argument("--ingest", type=int, default=0,
+                        help="stream this many EXPENSE lines from text and JSONL logs (e.g. 5000000)")
+    parser.add_argument("--groups", type=int, default=0,
+                        help="benchmark group-sharded ingestion over this many groups (e.g. 10000)")
+    parser.add_argument("--expenses", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="largest worker count to try")
+    parser.add_argument("--journal", type=int, default=0,
+                        help="benchmark journaled ingestion, recovery and undo over this many expenses")
+    parser.add_argument("--snapshot-every", type=int, default=100_000)
+    parser.add_argument("--vector", type=int, default=0,
+                        help="benchmark the NumPy balance engine over this many expenses (e.g. 10000000)")
+    parser.add_argument("--memory", action="store_true",
+                        help="measure heap used by --users users and their expenses")
+    args = parser.parse_args()
+
+    if args.memory:
+        bench_memory(args.users, args.group_size, args.expenses_per_group, args.seed)
+    elif args.vector:
+        bench_vector(args.vector, min(args.users, 100_000), args.group_size, args.seed)
+    elif args.journal:
+        bench_journal(args.journal, min(args.users, 100_000), args.group_size, args.snapshot_every, args.seed)
+    elif args.groups:
+        bench_groups(args.groups, args.group_size, args.expenses, args.workers, args.seed)
+    elif args.ingest:
+        bench_ingest(args.ingest, min(args.users, 100_000), args.group_size, args.seed)
+    elif args.splits:
+        bench_splits(args.splits, args.group_size, args.seed)
+    else:
+        bench_settle(args.users, args.group_size, args.expenses_per_group, args.seed)